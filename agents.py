@@ -1,13 +1,67 @@
+import bisect
+import functools
+import itertools
+from collections import defaultdict
+
 from mesa import Agent
-import random
+from events import EventType, DEATH_CAUSES
+
+# Slots for the attributes mesa's Agent.__init__ sets. Agent itself has no
+# __slots__, but when every attribute lands in a slot the per-instance
+# __dict__ is never created.
+AGENT_SLOTS = ("unique_id", "model", "pos")
+
+# How far pets look for a partner
+MATE_RADIUS = 12
+
+# Fast-forward: the longest run of idle ticks a pet skips in one go
+MAX_COAST_TICKS = 8
+# One random_move as (offset, probability), offsets as dx + dy*1j so that they add up
+MOORE_WALK = tuple((complex(dx, dy), 1 / 8) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+
+
+@functools.lru_cache(maxsize=None)
+def walk_distribution(moves):
+    """Where `moves` random moves end up, as sum_distribution gives it"""
+    return sum_distribution(MOORE_WALK, moves)
+
+
+@functools.lru_cache(maxsize=None)
+def count_distribution(chance, draws):
+    """How many of `draws` draws succeed with the given chance each, as sum_distribution gives it"""
+    return sum_distribution(((1, chance), (0, 1 - chance)), draws)
+
+
+def sum_distribution(outcomes, draws):
+    """
+    Distribution of the sum of `draws` independent draws from `outcomes`, a
+    tuple of (value, probability), as (values, cumulative probabilities) for
+    sampling the sum with a single uniform number
+    """
+    totals = {0: 1.0}
+    for _ in range(draws):
+        following = defaultdict(float)
+        for total, p in totals.items():
+            for value, q in outcomes:
+                following[total + value] += p * q
+        totals = following
+    cumulative = list(itertools.accumulate(totals.values()))
+    # Rounding must not leave a uniform number past the last value
+    cumulative[-1] = 1.0
+    return list(totals), cumulative
+
 
 class PetAgent(Agent):
-    def __init__(self, unique_id, model, max_age_range, repro_chance, repro_cooldown):
+    # Per-pet state is slotted; values shared by a whole species (max_age_range,
+    # reproduction_chance, reproduction_cooldown_period, max_hunger) are class attributes
+    __slots__ = AGENT_SLOTS + ("age", "max_age", "reproduction_cooldown", "hunger", "health", "state")
+    # Chance per tick that hunger goes up by one
+    hunger_chance = 0.1
+
+    def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.age = 0
-        self.max_age = random.randint(*max_age_range)
-        self.reproduction_chance = repro_chance
-        self.reproduction_cooldown_period = repro_cooldown
+        self.max_age = self.random.randint(*self.max_age_range)
         self.reproduction_cooldown = 0
 
     def update_vitals_and_age(self):
@@ -16,14 +70,62 @@ class PetAgent(Agent):
             self.reproduction_cooldown -= 1
 
         
-        if self.random.random() < 0.1:  
+        if self.random.random() < self.hunger_chance:
             self.hunger = min(self.max_hunger, self.hunger + 1)
 
+    def coast(self):
+        """
+        Fast-forward an idle pet: if it surely keeps idling for a few ticks,
+        apply their drift and random walk now and sit the rest of them out.
+        Returns whether it did; the ticks skipped are never the ones where a
+        threshold could be crossed. Called by FastForwardScheduler in place of
+        step() while the model is coasting.
+        """
+        ticks = min(self.idle_ticks(), MAX_COAST_TICKS)
+        if ticks < 2:
+            return False
+        self.drift(ticks)
+        self.hunger += self.draw(count_distribution(self.hunger_chance, ticks))
+        self.age += ticks
+        self.reproduction_cooldown = max(0, self.reproduction_cooldown - ticks)
+        walk = self.draw(walk_distribution(ticks))
+        target = (self.pos[0] + int(walk.real), self.pos[1] + int(walk.imag))
+        self.model.grid.move_agent(self, self.model.grid.torus_adj(target))
+        self.model.suspend(self, ticks - 1)
+        self.state = self.idle_state
+        return True
+
+    def draw(self, distribution):
+        """One value from a (values, cumulative probabilities) distribution"""
+        values, cumulative = distribution
+        return values[bisect.bisect(cumulative, self.random.random())]
+
+    def death_cause(self):
+        """Why this pet should die now, or None if it is still alive"""
+        if self.hunger >= self.max_hunger:
+            return "starvation"
+        if self.age >= self.max_age:
+            return "old_age"
+        if self.health <= 0:
+            return "illness"
+        return None
+
+    def die(self, cause):
+        self.model.remove_agent(self)
+        self.model.total_deaths += 1
+        self.model.deaths_by_cause[cause] += 1
+        self.model.events.emit(EventType.DEATH, self.unique_id, value=DEATH_CAUSES.index(cause), species=self.species)
+
     def get_nearby_agents(self, agent_type, radius=1):
         if self.pos is None:
             return []
-        all_neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=radius)
-        return [agent for agent in all_neighbors if isinstance(agent, agent_type)]
+        return self.model.spatial.within_radius(self.pos, agent_type, radius)
+
+    def nearest_agent(self, agent_type, radius=1, predicate=None):
+        """Closest agent of agent_type within radius, same pick as min(get_nearby_agents, key=distance_to)"""
+        if self.pos is None:
+            return None
+        return self.model.spatial.nearest(self.pos, agent_type, radius, predicate)
 
     def move_towards(self, target_pos):
         # Check if agent is still on the grid
@@ -36,6 +138,33 @@ class PetAgent(Agent):
         new_pos = (self.pos[0] + step_x, self.pos[1] + step_y)
         self.model.grid.move_agent(self, new_pos)
 
+    def find_partner(self):
+        """
+        The partner seek_mate goes for: this tick's planned partner when the
+        model matches mates in batches, else the nearest ready one within radius 12
+        """
+        plan = self.model.mate_plan
+        if plan is not None and self.unique_id in plan:
+            partner = plan[self.unique_id]
+            if partner is None or (partner.pos is not None and partner.is_ready_partner()):
+                return partner
+        return self.nearest_agent(type(self), radius=MATE_RADIUS,
+                                  predicate=lambda p: p.is_ready_partner() and p.unique_id != self.unique_id)
+
+    def follow_food_scent(self):
+        """seek_food on the model's FoodField: eat food here, else step up the scent, else wander"""
+        field = self.model.food_field
+        if not field.food[self.pos]:
+            step = field.uphill(self.pos)
+            if step is None:
+                self.random_move()
+                return
+            self.model.grid.move_agent(self, step)
+            if not field.food[self.pos]:
+                return
+        food = next(a for a in self.model.grid.iter_cell_list_contents([self.pos]) if isinstance(a, FoodMarker))
+        self.eat(food)
+
     def distance_to(self, other_agent):
         # Check if both agents are still on the grid
         if self.pos is None or other_agent.pos is None:
@@ -46,18 +175,28 @@ class PetAgent(Agent):
         # Check if agent is still on the grid
         if self.pos is None:
             return
-        possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
+        possible_steps = self.model.grid.neighborhoods.around(self.pos)
         new_position = self.random.choice(possible_steps)
         self.model.grid.move_agent(self, new_position)
 
 
 class DogAgent(PetAgent):
+    __slots__ = ("energy",)
+    species = "dog"
+    max_age_range = (200, 250)
+    reproduction_chance = 0.4
+    reproduction_cooldown_period = 8
+    max_hunger = 30
+    # Chance per tick that energy goes down by one
+    energy_chance = 0.5
+    # State shown while fast-forwarding
+    idle_state = "playing"
+
     def __init__(self, unique_id, model):
-        super().__init__(unique_id, model, max_age_range=(200, 250), repro_chance=0.4, repro_cooldown=8)
+        super().__init__(unique_id, model)
         self.hunger = 3  
         self.energy = 8  
         self.state = "idle"
-        self.max_hunger = 30  
         self.health = 100
 
     def step(self):
@@ -65,9 +204,9 @@ class DogAgent(PetAgent):
         if self.pos is None:
             return
 
-        if self.hunger >= self.max_hunger or self.age >= self.max_age or self.health <= 0:
-            self.model.grid.remove_agent(self)
-            self.model.schedule.remove(self)
+        cause = self.death_cause()
+        if cause:
+            self.die(cause)
             return
         if self.hunger >= 22:  
             self.state = "seeking_food"
@@ -86,15 +225,28 @@ class DogAgent(PetAgent):
             self.state = "playing"
             self.play()
 
-        if self.random.random() < 0.5:  
+        if self.random.random() < self.energy_chance:
             self.energy = max(0, self.energy - 1)
         
         self.update_vitals_and_age()
 
+    def idle_ticks(self):
+        """How many ticks from now this dog surely keeps playing, and is not a ready partner until after them"""
+        if self.hunger >= 12 or self.energy <= 1:
+            return 0
+        # Cooling down or too young to mate, so not seeking a mate
+        unready = max(self.reproduction_cooldown - 1, 24 - self.age)
+        return max(0, min(12 - self.hunger, self.energy - 1, self.max_age - self.age, unready))
+
+    def drift(self, ticks):
+        self.energy -= self.draw(count_distribution(self.energy_chance, ticks))
+
     def seek_food(self):
-        nearby_food = self.get_nearby_agents(FoodMarker, radius=10)  
-        if nearby_food:
-            food_to_get = min(nearby_food, key=lambda f: self.distance_to(f))
+        if self.model.food_field is not None:
+            self.follow_food_scent()
+            return
+        food_to_get = self.nearest_agent(FoodMarker, radius=10)
+        if food_to_get:
             self.move_towards(food_to_get.pos)
             if self.pos == food_to_get.pos:
                 self.eat(food_to_get)
@@ -102,8 +254,8 @@ class DogAgent(PetAgent):
             self.random_move()
 
     def eat(self, food):
-        self.model.grid.remove_agent(food)
-        self.model.schedule.remove(food)
+        self.model.remove_agent(food)
+        self.model.events.emit(EventType.EAT, self.unique_id, food.unique_id, species=self.species)
         self.hunger = max(0, self.hunger - 15)  
         self.energy = min(10, self.energy + 3)  
         self.health = min(100, self.health + 8) 
@@ -116,17 +268,16 @@ class DogAgent(PetAgent):
     def play(self):
         self.random_move()
 
-    def seek_mate(self):
-        nearby_partners = self.get_nearby_agents(DogAgent, radius=12) 
+    def is_ready_partner(self):
         # Even more lenient partner requirements
-        ready_partners = [p for p in nearby_partners if 
-                         p.reproduction_cooldown == 0 and 
-                         p.hunger <= 20 and  # More lenient
-                         p.age >= 25 and  # Lower maturity age
-                         p.unique_id != self.unique_id]  
+        return (self.reproduction_cooldown == 0 and 
+                self.hunger <= 20 and  # More lenient
+                self.age >= 25)  # Lower maturity age
+
+    def seek_mate(self):
+        partner = self.find_partner()
         
-        if ready_partners:
-            partner = min(ready_partners, key=lambda p: self.distance_to(p))
+        if partner:
             if self.distance_to(partner) <= 1:
                 self.try_reproduce_with(partner)
             else:
@@ -155,34 +306,44 @@ class DogAgent(PetAgent):
             self.model.next_agent_id += 1
             
             # Try to place offspring nearby
-            possible_positions = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=True)
+            possible_positions = self.model.grid.neighborhoods.block(self.pos)
             for pos in possible_positions:
                 if self.model.grid.is_cell_empty(pos):
-                    self.model.grid.place_agent(offspring, pos)
-                    self.model.schedule.add(offspring)
-                    print(f"Dog {self.unique_id} mated with {partner.unique_id} - offspring {offspring.unique_id}")
-                    return
-            
-            # If no empty space nearby, place randomly
-            self.model.place_agent_on_empty(offspring)
-            print(f"Dog {self.unique_id} mated with {partner.unique_id} - offspring {offspring.unique_id}")
+                    self.model.add_agent(offspring, pos)
+                    break
+            else:
+                # If no empty space nearby, place randomly
+                self.model.place_agent_on_empty(offspring)
+            self.model.total_births += 1
+            self.model.events.emit(EventType.BIRTH, self.unique_id, partner.unique_id, offspring.unique_id,
+                                   species=self.species)
 
 
 class CatAgent(PetAgent):
+    __slots__ = ("sleepiness",)
+    species = "cat"
+    max_age_range = (190, 230)
+    reproduction_chance = 0.25
+    reproduction_cooldown_period = 20
+    max_hunger = 32
+    # Chance per tick that sleepiness goes up by one
+    sleepiness_chance = 0.4
+    # State shown while fast-forwarding
+    idle_state = "wandering"
+
     def __init__(self, unique_id, model):
-        super().__init__(unique_id, model, max_age_range=(190, 230), repro_chance=0.25, repro_cooldown=20)
+        super().__init__(unique_id, model)
         self.hunger = 2  
         self.sleepiness = 4  
         self.state = "idle"
-        self.max_hunger = 32  
         self.health = 100
 
     def step(self):
         if self.pos is None:
             return
-        if self.hunger >= self.max_hunger or self.age >= self.max_age or self.health <= 0:
-            self.model.grid.remove_agent(self)
-            self.model.schedule.remove(self)
+        cause = self.death_cause()
+        if cause:
+            self.die(cause)
             return
         if self.hunger >= 24:  
             self.state = "seeking_food"
@@ -205,15 +366,27 @@ class CatAgent(PetAgent):
             self.wander()
 
         
-        if self.random.random() < 0.4:  
+        if self.random.random() < self.sleepiness_chance:
             self.sleepiness = min(10, self.sleepiness + 1)
         
         self.update_vitals_and_age()
 
+    def idle_ticks(self):
+        """How many ticks from now this cat surely keeps wandering, and is not a ready partner until after them"""
+        if self.hunger >= 14 or self.sleepiness >= 7:
+            return 0
+        unready = max(self.reproduction_cooldown - 1, 39 - self.age)
+        return max(0, min(14 - self.hunger, 7 - self.sleepiness, self.max_age - self.age, unready))
+
+    def drift(self, ticks):
+        self.sleepiness += self.draw(count_distribution(self.sleepiness_chance, ticks))
+
     def seek_food(self):
-        nearby_food = self.get_nearby_agents(FoodMarker, radius=10)
-        if nearby_food:
-            food_to_get = min(nearby_food, key=lambda f: self.distance_to(f))
+        if self.model.food_field is not None:
+            self.follow_food_scent()
+            return
+        food_to_get = self.nearest_agent(FoodMarker, radius=10)
+        if food_to_get:
             self.move_towards(food_to_get.pos)
             if self.pos == food_to_get.pos:
                 self.eat(food_to_get)
@@ -221,8 +394,8 @@ class CatAgent(PetAgent):
             self.random_move()
 
     def eat(self, food):
-        self.model.grid.remove_agent(food)
-        self.model.schedule.remove(food)
+        self.model.remove_agent(food)
+        self.model.events.emit(EventType.EAT, self.unique_id, food.unique_id, species=self.species)
         self.hunger = max(0, self.hunger - 18)  # Even more effective eating
         self.health = min(100, self.health + 5)
         self.state = "eating"
@@ -234,17 +407,16 @@ class CatAgent(PetAgent):
     def wander(self):
         self.random_move()
 
+    def is_ready_partner(self):
+        return (self.reproduction_cooldown == 0 and 
+                self.hunger <= 15 and 
+                self.sleepiness <= 5 and  
+                self.age >= 40)
+
     def seek_mate(self):
-        nearby_partners = self.get_nearby_agents(CatAgent, radius=12)
-        ready_partners = [p for p in nearby_partners if 
-                         p.reproduction_cooldown == 0 and 
-                         p.hunger <= 15 and 
-                         p.sleepiness <= 5 and  
-                         p.age >= 40 and  #
-                         p.unique_id != self.unique_id]
+        partner = self.find_partner()
         
-        if ready_partners:
-            partner = min(ready_partners, key=lambda p: self.distance_to(p))
+        if partner:
             if self.distance_to(partner) <= 1:
                 self.try_reproduce_with(partner)
             else:
@@ -271,30 +443,35 @@ class CatAgent(PetAgent):
 
             self.model.next_agent_id += 1
             
-            possible_positions = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=True)
+            possible_positions = self.model.grid.neighborhoods.block(self.pos)
             for pos in possible_positions:
                 if self.model.grid.is_cell_empty(pos):
-                    self.model.grid.place_agent(offspring, pos)
-                    self.model.schedule.add(offspring)
-                    print(f"Cat {self.unique_id} mated with {partner.unique_id} - offspring {offspring.unique_id}")
-                    return
-            
-            self.model.place_agent_on_empty(offspring)
-            print(f"Cat {self.unique_id} mated with {partner.unique_id} - offspring {offspring.unique_id}")
+                    self.model.add_agent(offspring, pos)
+                    break
+            else:
+                # If no empty space nearby, place randomly
+                self.model.place_agent_on_empty(offspring)
+            self.model.total_births += 1
+            self.model.events.emit(EventType.BIRTH, self.unique_id, partner.unique_id, offspring.unique_id,
+                                   species=self.species)
 
 
 class FeederAgent(Agent):
+    __slots__ = AGENT_SLOTS + ("state", "food_dropped_count", "cooldown")
+    drop_rate = 0.4
+    max_cooldown = 8
+    # Built once rather than formatting a new string every cooldown tick
+    cooldown_states = tuple(f"cooldown ({n})" for n in range(max_cooldown + 1))
+
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
-        self.drop_rate = 0.4 
         self.state = "patrolling"
         self.food_dropped_count = 0
         self.cooldown = 0
-        self.max_cooldown = 8  
 
     def step(self):
         if self.cooldown > 0:
-            self.state = f"cooldown ({self.cooldown})"
+            self.state = self.cooldown_states[self.cooldown]
             self.cooldown -= 1
             return
 
@@ -304,39 +481,44 @@ class FeederAgent(Agent):
             self.drop_food()
 
     def patrol(self):
-        possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
+        possible_steps = self.model.grid.neighborhoods.around(self.pos)
         new_position = self.random.choice(possible_steps)
         self.model.grid.move_agent(self, new_position)
 
     def drop_food(self):
         cell_contents = self.model.grid.get_cell_list_contents([self.pos])
         if not any(isinstance(obj, FoodMarker) for obj in cell_contents):
-            food_item = FoodMarker(self.model.next_agent_id, self.model)
-            self.model.grid.place_agent(food_item, self.pos)
-            self.model.schedule.add(food_item)
+            food_item = self.model.new_food(self.model.next_agent_id)
+            self.model.add_agent(food_item, self.pos)
             self.model.next_agent_id += 1
+            self.model.events.emit(EventType.FOOD_DROP, self.unique_id, food_item.unique_id)
 
             self.food_dropped_count += 1
             if self.food_dropped_count >= 10:
                 self.food_dropped_count = 0
                 self.cooldown = self.max_cooldown
+                # An event scheduler sleeps through the cooldown instead of counting it down
+                if self.model.suspend(self, self.max_cooldown):
+                    self.cooldown = 0
+                    self.state = "cooldown"
 
 
 class BusinessAgent(Agent):
+    __slots__ = AGENT_SLOTS + ("state", "money_earned", "animals_collected", "steps_taken", "price_per_dog",
+                               "price_per_cat", "target_species")
+    hunt_radius = 20
+    collection_target = 10
+    max_steps = 5
+
     def __init__(self, unique_id, model, target_species=None):
         super().__init__(unique_id, model)
         self.state = "hunting"
         self.money_earned = 0
         self.animals_collected = 0
-        self.hunt_radius = 20  
-        self.collection_target = 10  
-        self.max_steps = 5 
         self.steps_taken = 0
-        self.price_per_dog = random.randint(3, 6)  
-        self.price_per_cat = random.randint(2, 4)
+        self.price_per_dog = self.random.randint(3, 6)  
+        self.price_per_cat = self.random.randint(2, 4)
         self.target_species = target_species  
-        
-        print(f"BusinessAgent {self.unique_id} targeting {target_species}s for harvest")
 
     def step(self):
         self.steps_taken += 1
@@ -353,12 +535,15 @@ class BusinessAgent(Agent):
     def hunt_target_animals(self):
        
         if self.target_species == 'dog':
-            targets = self.get_nearby_agents(DogAgent, radius=self.hunt_radius)
+            target_type = DogAgent
         elif self.target_species == 'cat':
-            targets = self.get_nearby_agents(CatAgent, radius=self.hunt_radius)
+            target_type = CatAgent
         else:
-            targets = []
-        
+            target_type = None
+
+        targets = []
+        if target_type is not None:
+            targets = self.model.spatial.nearest_first(self.pos, target_type, self.hunt_radius)
         if not targets:
             self.state = f"searching for {self.target_species}s (no targets found)"
             self.random_move()
@@ -368,9 +553,11 @@ class BusinessAgent(Agent):
         captured_this_step = 0
         max_captures_per_step = 3
         
-       
-        targets.sort(key=lambda x: self.distance_to(x))
-        
+        # The hunter steps towards every target it cannot reach yet. The steps stay
+        # on the map, as they head for a cell on it, so they are tracked here and
+        # only the final position goes to the grid
+        x, y = self.pos
+        moved = False
         for target in targets:
             if self.animals_collected >= self.collection_target:
                 break
@@ -378,14 +565,20 @@ class BusinessAgent(Agent):
                 break
                 
            
-            if self.distance_to(target) <= self.hunt_radius:
-                if self.distance_to(target) > 1:
-                    self.move_towards(target.pos)
+            tx, ty = target.pos
+            distance = max(abs(x - tx), abs(y - ty))
+            if distance <= self.hunt_radius:
+                if distance > 1:
+                    x += (tx > x) - (tx < x)
+                    y += (ty > y) - (ty < y)
+                    moved = True
+                    distance -= 1
                 
-                
-                if self.distance_to(target) <= 1:
+                if distance <= 1:
                     if self.attempt_capture(target):
                         captured_this_step += 1
+        if moved:
+            self.model.grid.move_agent(self, (x, y))
         
         if captured_this_step == 0:
             self.state = f"hunting {self.target_species}s"
@@ -397,10 +590,8 @@ class BusinessAgent(Agent):
         if self.random.random() < 0.9:  # 90% success rate
             if isinstance(target, DogAgent):
                 price = self.price_per_dog
-                animal_type = "Dog"
             else:
                 price = self.price_per_cat
-                animal_type = "Cat"
             
             self.money_earned += price
             self.animals_collected += 1
@@ -410,53 +601,46 @@ class BusinessAgent(Agent):
             self.model.total_money_made += price
             
             # Remove the animal from the ecosystem
-            self.model.grid.remove_agent(target)
-            self.model.schedule.remove(target)
+            self.model.remove_agent(target)
             
-            print(f"💼 BusinessAgent {self.unique_id} captured {animal_type} {target.unique_id} for ${price} (Total: {self.animals_collected}/{self.collection_target})")
+            self.model.events.emit(EventType.CAPTURE, self.unique_id, target.unique_id, price, species=target.species)
             return True
         else:
-            print(f"BusinessAgent {self.unique_id} failed to capture {type(target).__name__} {target.unique_id}")
+            self.model.events.emit(EventType.CAPTURE_FAILED, self.unique_id, target.unique_id, species=target.species)
             return False
 
     def leave_ecosystem(self):
         # Business agent leaves after completing mission
-        print(f"BusinessAgent {self.unique_id} is leaving after {self.steps_taken} steps with {self.animals_collected} {self.target_species}s, earned ${self.money_earned}")
-        if self in self.model.schedule.agents:
-            self.model.grid.remove_agent(self)
-            self.model.schedule.remove(self)
-            self.model.business_agents_active -= 1
-
-    def get_nearby_agents(self, agent_type, radius=1):
-        all_neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=radius)
-        return [agent for agent in all_neighbors if isinstance(agent, agent_type)]
-
-    def distance_to(self, other_agent):
-        return max(abs(self.pos[0] - other_agent.pos[0]), abs(self.pos[1] - other_agent.pos[1]))
-
-    def move_towards(self, target_pos):
-        dx = target_pos[0] - self.pos[0]
-        dy = target_pos[1] - self.pos[1]
-        step_x = 0 if dx == 0 else dx // abs(dx)
-        step_y = 0 if dy == 0 else dy // abs(dy)
-        new_pos = (self.pos[0] + step_x, self.pos[1] + step_y)
-        self.model.grid.move_agent(self, new_pos)
+        self.model.events.emit(EventType.BUSINESS_LEAVE, self.unique_id, self.animals_collected, self.money_earned,
+                               species=self.target_species)
+        if self.pos is not None:
+            self.model.remove_agent(self)
 
     def random_move(self):
-        possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
+        possible_steps = self.model.grid.neighborhoods.around(self.pos)
         new_position = self.random.choice(possible_steps)
         self.model.grid.move_agent(self, new_position)
 
 
 class FoodMarker(Agent):
+    # Markers are recycled by PetModel.new_food, which calls __init__ again on a removed one
+    __slots__ = AGENT_SLOTS + ("born",)
+    expiration_time = 75
+
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
-        self.expiration_time = 75
-        self.age = 0
+        # Step in which the marker was dropped; its age follows from it
+        self.born = model.step_count
+
+    @property
+    def age(self):
+        return self.model.step_count - self.born
 
     def step(self):
-        self.age += 1
         if self.age >= self.expiration_time:
-            if self in self.model.schedule.agents:  
-                self.model.grid.remove_agent(self)
-                self.model.schedule.remove(self)
\ No newline at end of file
+            self.expire()
+
+    def expire(self):
+        if self.pos is not None:
+            self.model.remove_agent(self)
+            self.model.events.emit(EventType.FOOD_EXPIRY, self.unique_id)
\ No newline at end of file
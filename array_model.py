@@ -0,0 +1,439 @@
+import hashlib
+import numpy as np
+from mesa import Model
+
+# Species codes
+DOG = 0
+CAT = 1
+
+# State codes, index into STATE_NAMES
+IDLE, SEEKING_FOOD, RESTING, SEEKING_MATE, PLAYING, SLEEPING, WANDERING, EATING = range(8)
+STATE_NAMES = ("idle", "seeking_food", "resting", "seeking_mate", "playing", "sleeping", "wandering", "eating")
+
+# Moore neighbourhood offsets in MultiGrid.get_neighborhood order
+MOORE_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)], dtype=np.int64)
+
+# Per-species constants, mirroring DogAgent / CatAgent
+MAX_AGE_RANGE = ((200, 250), (190, 230))
+MAX_HUNGER = np.array([30, 32], dtype=np.int16)
+REPRO_CHANCE = np.array([0.4, 0.25])
+REPRO_COOLDOWN = np.array([8, 20], dtype=np.int16)
+
+FOOD_RADIUS = 10
+MATE_RADIUS = 12
+FOOD_EXPIRATION = 75
+# Random streams, see ArrayPetModel._random
+TIRED, SLEEPY, HUNGRIER, EAT_ORDER, MATE_ORDER, REPRO = range(6)
+
+# Columns on each side of a band that plan_moves reads besides the band itself
+HALO = max(FOOD_RADIUS, MATE_RADIUS)
+
+PET_COLUMNS = ("uid", "species", "x", "y", "age", "max_age", "hunger", "energy", "sleepiness",
+               "health", "reproduction_cooldown", "state")
+
+
+def decide_states(species, hunger, energy, sleepiness, cooldown, age):
+    """State machine, same branch order as DogAgent.step / CatAgent.step"""
+    dog_state = np.select(
+        [hunger >= 22, energy <= 1,
+         (hunger <= 18) & (energy >= 3) & (cooldown == 0) & (age >= 25),
+         hunger >= 12],
+        [SEEKING_FOOD, RESTING, SEEKING_MATE, SEEKING_FOOD], PLAYING)
+    cat_state = np.select(
+        [hunger >= 24, sleepiness >= 9,
+         (hunger <= 15) & (sleepiness <= 5) & (cooldown == 0) & (age >= 40),
+         hunger >= 14, sleepiness >= 7],
+        [SEEKING_FOOD, SLEEPING, SEEKING_MATE, SEEKING_FOOD, SLEEPING], WANDERING)
+    return np.where(species == DOG, dog_state, cat_state).astype(np.int8)
+
+
+def window_counts(x, y, x_start, columns, width, height):
+    """
+    Agents per cell of the window of `columns` grid columns starting at x_start
+    (wrapping, so a column may appear more than once when the window is wider
+    than the grid).
+    """
+    counts = np.zeros((columns, height), dtype=np.int32)
+    col = (x - x_start) % width
+    while True:
+        inside = col < columns
+        if not inside.any():
+            return counts
+        np.add.at(counts, (col[inside], y[inside]), 1)
+        col = col[inside] + width
+        y = y[inside]
+
+
+def gradient_step(field, radius, x, y):
+    """
+    Step towards the busier half of each (2r+1)^2 window around (x, y) in field,
+    a window of grid columns with at least `radius` columns on either side of
+    every x (rows wrap). Returns (found, step) where found marks windows holding
+    anything besides the centre cell.
+    """
+    columns, height = field.shape
+    table = np.zeros((columns + 1, height + 2 * radius + 1), dtype=np.int64)
+    table[1:, 1:] = np.pad(field, ((0, 0), (radius, radius)), mode="wrap").cumsum(axis=0).cumsum(axis=1)
+
+    def window(x0, x1, y0, y1):
+        # Inclusive bounds, y shifted into the padded table
+        x1, y0, y1 = x1 + 1, y0 + radius, y1 + radius + 1
+        return table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+
+    left = window(x - radius, x - 1, y - radius, y + radius)
+    right = window(x + 1, x + radius, y - radius, y + radius)
+    down = window(x - radius, x + radius, y - radius, y - 1)
+    up = window(x - radius, x + radius, y + 1, y + radius)
+    total = window(x - radius, x + radius, y - radius, y + radius) - field[x, y]
+
+    step = np.stack([np.sign(right - left), np.sign(up - down)], axis=1)
+    # A perfectly balanced window gives no direction; keep the random step then
+    found = (total > 0) & step.any(axis=1)
+    return found, step
+
+
+def plan_moves(pets, food_age, x_lo, x_hi, directions):
+    """
+    Movement phase for the pets with x_lo <= x < x_hi: state machine, resting
+    and sleeping, then one step towards the busier half of the mate or food
+    window, or MOORE_OFFSETS[directions(uids)] when nothing pulls. Only the grid
+    columns within HALO of the band are read, so bands can be planned
+    independently. Returns (rows, plan): the band's row indices and their new
+    x, y, state, energy, sleepiness and health plus wants_food / seeking_mate.
+    """
+    width, height = food_age.shape
+    x, y = pets["x"], pets["y"]
+    x_start = x_lo - HALO
+    columns = x_hi - x_lo + 2 * HALO
+
+    # Pets the band can see: its own plus those in the halo, which may be ready partners
+    near = np.flatnonzero((x - x_start) % width < columns)
+    species = pets["species"][near]
+    hunger = pets["hunger"][near]
+    age = pets["age"][near]
+    cooldown = pets["reproduction_cooldown"][near]
+    energy = pets["energy"][near].copy()
+    sleepiness = pets["sleepiness"][near].copy()
+    health = pets["health"][near].copy()
+    state = decide_states(species, hunger, energy, sleepiness, cooldown, age)
+
+    # Resting and sleeping
+    resting = state == RESTING
+    energy[resting] = np.minimum(10, energy[resting] + 4)
+    health[resting] = np.minimum(100, health[resting] + 2)
+    sleeping = state == SLEEPING
+    sleepiness[sleeping] = np.maximum(0, sleepiness[sleeping] - 5)
+    health[sleeping] = np.minimum(100, health[sleeping] + 3)
+
+    # Vectorized DogAgent.is_ready_partner / CatAgent.is_ready_partner
+    is_dog = species == DOG
+    ready = (cooldown == 0) & np.where(is_dog, (hunger <= 20) & (age >= 25),
+                                       (hunger <= 15) & (sleepiness <= 5) & (age >= 40))
+
+    near_x = x[near]
+    own = (near_x >= x_lo) & (near_x < x_hi)
+    rows = near[own]
+    n = len(rows)
+    local_x = near_x[own] - x_start
+    local_y = y[rows]
+
+    # Movement: one (dx, dy) step per pet, random unless a target pulls it
+    step = MOORE_OFFSETS[directions(pets["uid"][rows])]
+    state, is_dog = state[own], is_dog[own]
+    moves = ~(resting[own] | sleeping[own])
+
+    seeking_mate = state == SEEKING_MATE
+    mate_pull = np.zeros(n, dtype=bool)
+    for code in (DOG, CAT):
+        sel = seeking_mate & (species[own] == code)
+        if sel.any():
+            partners = ready & (species == code)
+            mates = window_counts(near_x[partners], y[near[partners]], x_start, columns, width, height)
+            # Seekers count themselves, which only matters on their own cell
+            found, toward = gradient_step(mates, MATE_RADIUS, local_x[sel], local_y[sel])
+            idx = np.flatnonzero(sel)
+            step[idx[found]] = toward[found]
+            mate_pull[idx[found]] = True
+
+    # Seekers without a partner in range fall back to food when hungry
+    fallback = seeking_mate & ~mate_pull & (hunger[own] >= np.where(is_dog, 8, 10))
+    wants_food = (state == SEEKING_FOOD) | fallback
+    if wants_food.any():
+        food = (food_age[np.arange(x_start, x_start + columns) % width] >= 0).astype(np.int32)
+        found, toward = gradient_step(food, FOOD_RADIUS, local_x[wants_food], local_y[wants_food])
+        idx = np.flatnonzero(wants_food)
+        step[idx[found]] = toward[found]
+
+    new_x, new_y = x[rows].copy(), local_y.copy()
+    new_x[moves] = (new_x[moves] + step[moves, 0]) % width
+    new_y[moves] = (new_y[moves] + step[moves, 1]) % height
+    return rows, {"x": new_x, "y": new_y, "state": state, "energy": energy[own], "sleepiness": sleepiness[own],
+                  "health": health[own], "wants_food": wants_food, "seeking_mate": seeking_mate}
+
+
+class ArrayPetModel(Model):
+    """
+    Vectorized alternative to PetModel for very large populations.
+
+    Pets are stored as struct-of-arrays NumPy columns (see PET_COLUMNS) and every
+    tick applies the DogAgent/CatAgent step rules to all of them at once: death
+    checks, the state machine, the hunger/energy/sleepiness decay and aging.
+    Food is a per-cell age grid (-1 means no food) and feeders are small arrays.
+
+    The per-agent radius scans are replaced by window sums over a summed-area
+    table: a pet seeking food (or a mate) steps towards the half of its radius
+    window that holds more food (or ready partners), rather than towards the
+    single nearest one. Mating pairs up seekers of the same species that share
+    a 2x2 block, which stands in for the distance <= 1 check, and offspring are
+    placed on the parent's cell.
+
+    Business agents and harvesting are not modelled, so there are no harvest
+    thresholds to set: batch.run_model and batch.sweep reject them for this
+    engine with a ValueError.
+    """
+    def __init__(self, width=20, height=20, num_dogs=3, num_cats=3, num_feeders=1, seed=None,
+                 fingerprint=False):
+        # seed is picked up by Model.__new__ and drives self.random
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.running = True
+        self.rng = np.random.default_rng(self.random.getrandbits(64))
+        self.next_agent_id = 0
+        # Parents (row indices) that produced offspring during the current tick
+        self._offspring = np.empty(0, dtype=np.int64)
+
+        # Food age per cell, -1 where there is no food
+        self.food_age = np.full((width, height), -1, dtype=np.int16)
+
+        self.feeder_x = self.rng.integers(0, width, num_feeders)
+        self.feeder_y = self.rng.integers(0, height, num_feeders)
+        self.feeder_cooldown = np.zeros(num_feeders, dtype=np.int16)
+        self.feeder_dropped = np.zeros(num_feeders, dtype=np.int16)
+        self.feeder_drop_rate = 0.4
+        self.feeder_max_cooldown = 8
+
+        self.pets = self._new_pets(np.array([DOG] * num_dogs + [CAT] * num_cats, dtype=np.int8),
+                                   self.rng.integers(0, width, num_dogs + num_cats),
+                                   self.rng.integers(0, height, num_dogs + num_cats))
+
+        # Same statistics as PetModel
+        self.step_count = 0
+        self.total_births = 0
+        self.total_deaths = 0
+        self.total_harvested = 0
+        self.total_money_made = 0
+        self.business_agents_active = 0
+        self.feeder_count = num_feeders
+        self._update_counts()
+
+        # Chained hash of the state after every step, as in PetModel
+        self.fingerprint = hashlib.blake2b(digest_size=16).hexdigest() if fingerprint else None
+
+    def _new_pets(self, species, x, y):
+        """Columns for freshly created pets, initialised like DogAgent/CatAgent.__init__"""
+        n = len(species)
+        is_dog = species == DOG
+        uid = np.arange(self.next_agent_id, self.next_agent_id + n, dtype=np.int64)
+        max_age = self._max_ages(species, uid)
+        pets = {
+            "uid": uid,
+            "species": species.astype(np.int8),
+            "x": np.asarray(x, dtype=np.int32),
+            "y": np.asarray(y, dtype=np.int32),
+            "age": np.zeros(n, dtype=np.int32),
+            "max_age": max_age.astype(np.int32),
+            "hunger": np.where(is_dog, 3, 2).astype(np.int16),
+            "energy": np.where(is_dog, 8, 0).astype(np.int16),
+            "sleepiness": np.where(is_dog, 0, 4).astype(np.int16),
+            "health": np.full(n, 100, dtype=np.int16),
+            "reproduction_cooldown": np.zeros(n, dtype=np.int16),
+            "state": np.full(n, IDLE, dtype=np.int8),
+        }
+        self.next_agent_id += n
+        return pets
+
+    def _update_counts(self):
+        self.dog_count = int(np.count_nonzero(self.pets["species"] == DOG))
+        self.cat_count = len(self.pets["species"]) - self.dog_count
+        self.food_count = int(np.count_nonzero(self.food_age >= 0))
+
+    def step(self):
+        self.step_count += 1
+
+        self._age_food()
+        self._remove_dead()
+        self._step_pets()
+        self._step_feeders()
+        self._update_counts()
+        if self.fingerprint is not None:
+            self.update_fingerprint()
+
+        # Stop simulation if all pets die
+        if self.dog_count == 0 and self.cat_count == 0:
+            self.running = False
+
+    def update_fingerprint(self):
+        digest = hashlib.blake2b(bytes.fromhex(self.fingerprint), digest_size=16)
+        for name in PET_COLUMNS:
+            digest.update(self.pets[name].tobytes())
+        for values in (self.food_age, self.feeder_x, self.feeder_y, self.feeder_cooldown, self.feeder_dropped):
+            digest.update(values.tobytes())
+        digest.update(repr((self.step_count, self.total_births, self.total_deaths)).encode())
+        self.fingerprint = digest.hexdigest()
+
+    def _age_food(self):
+        has_food = self.food_age >= 0
+        self.food_age[has_food] += 1
+        self.food_age[self.food_age >= FOOD_EXPIRATION] = -1
+
+    def _remove_dead(self):
+        p = self.pets
+        dead = ((p["hunger"] >= MAX_HUNGER[p["species"]]) | (p["age"] >= p["max_age"]) | (p["health"] <= 0))
+        if dead.any():
+            self.total_deaths += int(np.count_nonzero(dead))
+            alive = ~dead
+            self.pets = {name: col[alive] for name, col in p.items()}
+
+    def _step_pets(self):
+        p = self.pets
+        n = len(p["uid"])
+        if n == 0:
+            return
+        is_dog = p["species"] == DOG
+        rows, plan = self._plan_moves()
+        for name in ("x", "y", "energy", "sleepiness", "health"):
+            p[name][rows] = plan[name]
+        state = np.empty(n, dtype=np.int8)
+        state[rows] = plan["state"]
+        wants_food = np.zeros(n, dtype=bool)
+        wants_food[rows] = plan["wants_food"]
+        seeking_mate = np.zeros(n, dtype=bool)
+        seeking_mate[rows] = plan["seeking_mate"]
+        hunger, energy, sleepiness = p["hunger"], p["energy"], p["sleepiness"]
+        cooldown, age = p["reproduction_cooldown"], p["age"]
+
+        self._eat(wants_food, is_dog, state)
+        self._mate(seeking_mate, is_dog)
+
+        # Vitals decay
+        dog_tired = is_dog & (self._random(TIRED, p["uid"]) < 0.5)
+        energy[dog_tired] = np.maximum(0, energy[dog_tired] - 1)
+        cat_sleepy = ~is_dog & (self._random(SLEEPY, p["uid"]) < 0.4)
+        sleepiness[cat_sleepy] = np.minimum(10, sleepiness[cat_sleepy] + 1)
+
+        age += 1
+        cooldown[cooldown > 0] -= 1
+        hungrier = self._random(HUNGRIER, p["uid"]) < 0.1
+        hunger[hungrier] = np.minimum(MAX_HUNGER[p["species"][hungrier]], hunger[hungrier] + 1)
+
+        p["state"][:] = state
+        self._add_offspring()
+
+    def _plan_moves(self):
+        """Movement phase for all pets as one band; returns (rows, plan) as plan_moves does"""
+        return plan_moves(self.pets, self.food_age, 0, self.width, lambda uids: self._directions(uids))
+
+    # Random draws, one stream per purpose; uids says whose draw each value is.
+    # These use self.rng in a fixed order; ParallelArrayPetModel replaces them
+    # with per-pet draws that do not depend on the order pets are processed in.
+    def _random(self, stream, uids):
+        return self.rng.random(len(uids))
+
+    def _directions(self, uids):
+        return self.rng.integers(0, 8, len(uids))
+
+    def _permutation(self, stream, rows):
+        return self.rng.permutation(rows)
+
+    def _max_ages(self, species, uids):
+        n = len(uids)
+        return np.where(species == DOG,
+                        self.rng.integers(MAX_AGE_RANGE[DOG][0], MAX_AGE_RANGE[DOG][1] + 1, n),
+                        self.rng.integers(MAX_AGE_RANGE[CAT][0], MAX_AGE_RANGE[CAT][1] + 1, n))
+
+    def _eat(self, wants_food, is_dog, state):
+        p = self.pets
+        x, y = p["x"], p["y"]
+        candidates = np.flatnonzero(wants_food & (self.food_age[x, y] >= 0))
+        if len(candidates) == 0:
+            return
+        # One eater per food cell, picked at random
+        candidates = self._permutation(EAT_ORDER, candidates)
+        _, first = np.unique(x[candidates] * self.height + y[candidates], return_index=True)
+        eaters = candidates[first]
+        self.food_age[x[eaters], y[eaters]] = -1
+
+        dogs = eaters[is_dog[eaters]]
+        p["hunger"][dogs] = np.maximum(0, p["hunger"][dogs] - 15)
+        p["energy"][dogs] = np.minimum(10, p["energy"][dogs] + 3)
+        p["health"][dogs] = np.minimum(100, p["health"][dogs] + 8)
+        cats = eaters[~is_dog[eaters]]
+        p["hunger"][cats] = np.maximum(0, p["hunger"][cats] - 18)
+        p["health"][cats] = np.minimum(100, p["health"][cats] + 5)
+        state[eaters] = EATING
+
+    def _mate(self, seeking_mate, is_dog):
+        p = self.pets
+        seekers = np.flatnonzero(seeking_mate)
+        self._offspring = seekers[:0]
+        if len(seekers) < 2:
+            return
+        seekers = self._permutation(MATE_ORDER, seekers)
+        block = (p["species"][seekers].astype(np.int64) * (self.width // 2 + 1) + p["x"][seekers] // 2) \
+            * (self.height // 2 + 1) + p["y"][seekers] // 2
+        order = np.argsort(block, kind="stable")
+        seekers, block = seekers[order], block[order]
+
+        # Pair consecutive seekers within each block: positions 0-1, 2-3, ...
+        starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]])
+        run_start = np.repeat(starts, np.diff(np.r_[starts, len(block)]))
+        offset = np.arange(len(block)) - run_start
+        first = np.flatnonzero((offset % 2 == 0) & (np.r_[block[1:] == block[:-1], False]))
+        a, b = seekers[first], seekers[first + 1]
+
+        success = self._random(REPRO, p["uid"][a]) < REPRO_CHANCE[p["species"][a]]
+        a, b = a[success], b[success]
+        if len(a) == 0:
+            return
+        pair = np.concatenate([a, b])
+        p["reproduction_cooldown"][pair] = REPRO_COOLDOWN[p["species"][pair]]
+        dogs = pair[is_dog[pair]]
+        p["energy"][dogs] = np.maximum(0, p["energy"][dogs] - 2)
+        p["hunger"][dogs] = np.minimum(MAX_HUNGER[DOG] - 1, p["hunger"][dogs] + 2)
+        cats = pair[~is_dog[pair]]
+        p["hunger"][cats] = np.minimum(MAX_HUNGER[CAT] - 1, p["hunger"][cats] + 5)
+        p["sleepiness"][cats] = np.minimum(10, p["sleepiness"][cats] + 3)
+        self._offspring = a
+
+    def _add_offspring(self):
+        parents = self._offspring
+        if len(parents) == 0:
+            return
+        p = self.pets
+        born = self._new_pets(p["species"][parents], p["x"][parents], p["y"][parents])
+        self.pets = {name: np.concatenate([p[name], born[name]]) for name in PET_COLUMNS}
+        self.total_births += len(parents)
+
+    def _step_feeders(self):
+        n = len(self.feeder_x)
+        if n == 0:
+            return
+        cooling = self.feeder_cooldown > 0
+        self.feeder_cooldown[cooling] -= 1
+
+        active = np.flatnonzero(~cooling)
+        step = MOORE_OFFSETS[self.rng.integers(0, 8, len(active))]
+        self.feeder_x[active] = (self.feeder_x[active] + step[:, 0]) % self.width
+        self.feeder_y[active] = (self.feeder_y[active] + step[:, 1]) % self.height
+
+        drops = active[self.rng.random(len(active)) < self.feeder_drop_rate]
+        for i in drops:
+            x, y = self.feeder_x[i], self.feeder_y[i]
+            if self.food_age[x, y] >= 0:
+                continue
+            self.food_age[x, y] = 0
+            self.feeder_dropped[i] += 1
+            if self.feeder_dropped[i] >= 10:
+                self.feeder_dropped[i] = 0
+                self.feeder_cooldown[i] = self.feeder_max_cooldown
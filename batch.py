@@ -0,0 +1,251 @@
+"""
+Headless batch runner: run PetModel without the browser, sweep parameters
+over many seeds on a process pool and stream per-step population series to
+a columnar store (see columnar.py).
+
+    python batch.py --steps 500 --seeds 20 --num-dogs 8 16 --num-cats 8 16 --out runs/
+
+With --cache, seeded runs are keyed on their parameters, seed, step count and
+the simulation sources; repeated runs are served from the cache, and identical
+tasks within one sweep are only run once.
+
+With --start-method forkserver, workers are forked from a server process that
+imported mesa and the models once, instead of each importing them anew.
+"""
+import argparse
+import hashlib
+import inspect
+import itertools
+import json
+import multiprocessing
+import os
+import numpy as np
+
+from columnar import ColumnWriter, SCHEMA_FILE, read_columns
+from events import SILENT
+from model import PetModel
+from array_model import ArrayPetModel
+
+ENGINES = {
+    "agent": PetModel,
+    "array": ArrayPetModel,
+}
+
+# Parameters that can be swept, with their defaults
+SWEEP_PARAMS = {
+    "width": 20,
+    "height": 20,
+    "num_dogs": 8,
+    "num_cats": 8,
+    "num_feeders": 3,
+    "dog_harvest_threshold": 30,
+    "cat_harvest_threshold": 30,
+}
+
+# Modules whose code decides the outcome of a run; editing any of them invalidates the cache
+CACHE_SOURCES = ("model.py", "agents.py", "array_model.py", "spatial.py", "chunked_grid.py", "events.py",
+                 "food_field.py", "scheduling.py", "mating.py", "checkpoint.py")
+
+# Bumped when a cache key comes to stand for a different run; version 1 keyed runs
+# that fell back to the engine's own defaults under the SWEEP_PARAMS values
+CACHE_VERSION = 2
+
+# Modules a forkserver imports once, before forking any worker
+PRELOAD = ("batch",)
+
+METRICS = ("dog_count", "cat_count", "food_count", "business_agents_active",
+           "total_births", "total_deaths", "total_harvested", "total_money_made")
+
+
+def run_model(steps, seed=None, engine="agent", fingerprint=False, **params):
+    """
+    Run one model for up to `steps` steps and return its per-step series as
+    {"step": array, metric: array, ...}. The run stops early if all pets die.
+    Sweep parameters left out of params take their SWEEP_PARAMS defaults.
+    With fingerprint=True the run fingerprint is added under "fingerprint".
+    """
+    series = {name: np.zeros(steps, dtype=np.int64) for name in METRICS}
+    params = resolve_params(engine, params)
+    if engine_accepts(engine, "verbosity"):
+        params.setdefault("verbosity", SILENT)
+    model = ENGINES[engine](seed=seed, fingerprint=fingerprint, **params)
+    done = 0
+    while done < steps and model.running:
+        model.step()
+        for name in METRICS:
+            series[name][done] = getattr(model, name)
+        done += 1
+    result = {name: values[:done] for name, values in series.items()}
+    result["step"] = np.arange(1, done + 1, dtype=np.int32)
+    if fingerprint:
+        result["fingerprint"] = model.fingerprint
+    return result
+
+
+def parameter_grid(**axes):
+    """Cartesian product of the given value lists, e.g. parameter_grid(num_dogs=[4, 8], width=[20])"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def source_version():
+    """Hash of CACHE_SOURCES, so cached results go stale when the simulation code changes"""
+    digest = hashlib.blake2b(digest_size=16)
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in CACHE_SOURCES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def resolve_params(engine, params):
+    """
+    The parameters a run passes to the engine: params plus the SWEEP_PARAMS
+    defaults it takes and params leaves out. Raises ValueError for parameters
+    the engine does not take.
+    """
+    unknown = sorted(name for name in params if not engine_accepts(engine, name))
+    if unknown:
+        raise ValueError(f"engine {engine!r} does not take {', '.join(unknown)}")
+    resolved = {name: default for name, default in SWEEP_PARAMS.items() if engine_accepts(engine, name)}
+    resolved.update(params)
+    return resolved
+
+
+def cache_key(params, seed, steps, engine, source):
+    """Cache key of one run; parameters left at their default key the same as explicit defaults"""
+    spec = {"params": resolve_params(engine, params), "seed": seed, "steps": steps, "engine": engine,
+            "source": source, "version": CACHE_VERSION}
+    return hashlib.blake2b(json.dumps(spec, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def load_cached(cache, key):
+    path = os.path.join(cache, key + ".npz")
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        series = {name: data[name] for name in data.files}
+    series["fingerprint"] = str(series["fingerprint"])
+    return series
+
+
+def store_cached(cache, key, series):
+    # Write to a temporary name first so readers never see a partial file
+    path = os.path.join(cache, key + ".npz")
+    tmp = os.path.join(cache, f"{key}.{os.getpid()}.tmp.npz")
+    np.savez(tmp, **series)
+    os.replace(tmp, path)
+
+
+def worker_pool(processes=None, start_method=None):
+    """
+    A process pool whose workers start with start_method ("fork", "spawn",
+    "forkserver", or the platform default for None). A forkserver preloads
+    PRELOAD, so its workers begin with mesa and the models already imported.
+    """
+    context = multiprocessing.get_context(start_method)
+    if context.get_start_method() == "forkserver":
+        context.set_forkserver_preload(list(PRELOAD))
+    return context.Pool(processes)
+
+
+def _run_task(task):
+    key, params, seed, steps, engine, fingerprint = task
+    return key, run_model(steps, seed=seed, engine=engine, fingerprint=fingerprint, **params)
+
+
+def sweep(grid, seeds, steps, out, processes=None, engine="agent", cache=None, start_method=None):
+    """
+    Run every parameter set in `grid` once per seed, spread over a process
+    pool, appending each finished run to the columnar store at `out` with the
+    parameters it ran with, SWEEP_PARAMS defaults included.
+    With a `cache` directory, seeded runs found there are not rerun and new
+    ones are added to it. start_method goes to worker_pool. Returns the number
+    of runs written.
+    """
+    # The parameters as the engine gets them, so every row records the run that was made
+    grid = [resolve_params(engine, params) for params in grid]
+    param_names = sorted({name for params in grid for name in params})
+    columns = {"run_id": np.int32, "seed": np.int64, "step": np.int32}
+    columns.update({name: np.int32 for name in param_names})
+    columns.update({name: np.int64 for name in METRICS})
+
+    # Appending to an existing store continues its run ids
+    first_run_id = 0
+    if os.path.exists(os.path.join(out, SCHEMA_FILE)):
+        run_ids = read_columns(out)["run_id"]
+        if len(run_ids):
+            first_run_id = int(run_ids.max()) + 1
+
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+        source = source_version()
+
+    # Runs that share a key are identical, so each key is run at most once
+    runs = {}
+    for run_id, (params, seed) in enumerate(itertools.product(grid, seeds), start=first_run_id):
+        if cache is not None and seed is not None:
+            key = cache_key(params, seed, steps, engine, source)
+        else:
+            key = f"run-{run_id}"
+        runs.setdefault(key, (params, seed, []))[2].append(run_id)
+
+    written = 0
+    with ColumnWriter(out, columns) as writer:
+        def write(key, series):
+            nonlocal written
+            params, seed, run_ids = runs[key]
+            for run_id in run_ids:
+                rows = dict(series, run_id=run_id, seed=seed)
+                for name in param_names:
+                    rows[name] = params[name]
+                writer.append(rows)
+                written += 1
+            writer.flush()
+
+        tasks = []
+        for key, (params, seed, _) in runs.items():
+            series = load_cached(cache, key) if cache is not None and seed is not None else None
+            if series is not None:
+                write(key, series)
+            else:
+                tasks.append((key, params, seed, steps, engine, cache is not None))
+        if tasks:
+            with worker_pool(processes, start_method) as pool:
+                for key, series in pool.imap_unordered(_run_task, tasks):
+                    if cache is not None and runs[key][1] is not None:
+                        store_cached(cache, key, series)
+                    write(key, series)
+    return written
+
+
+def engine_accepts(engine, name):
+    """Whether the engine's constructor takes the given sweep parameter"""
+    return name in inspect.signature(ENGINES[engine]).parameters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run PetModel headless over a parameter grid")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--seeds", type=int, default=10, help="replicates per parameter set")
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="pool size, defaults to all cores")
+    parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(), default=None,
+                        help="how pool workers are started, defaults to the platform's")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="agent")
+    parser.add_argument("--out", required=True, help="output directory for the columnar series")
+    parser.add_argument("--cache", default=None, help="directory of cached run results to reuse")
+    for name, default in SWEEP_PARAMS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, nargs="+", default=[default])
+    args = parser.parse_args(argv)
+
+    grid = parameter_grid(**{name: getattr(args, name) for name in SWEEP_PARAMS
+                             if engine_accepts(args.engine, name)})
+    seeds = range(args.seed_start, args.seed_start + args.seeds)
+    runs = sweep(grid, seeds, args.steps, args.out, processes=args.processes, engine=args.engine,
+                 cache=args.cache, start_method=args.start_method)
+    print(f"Wrote {runs} runs ({len(grid)} parameter sets x {args.seeds} seeds) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Benchmark suite for PetModel tick throughput and per-behaviour cost.
+
+Each configuration is run --repeats times untouched to measure steps/second,
+and as often under profiling.Profiler for the step phases and agent hot-path
+methods; the fastest run of each is reported, as it is the least disturbed.
+Results are written as JSON; --compare checks them against a saved baseline
+and exits with status 1 when anything regressed by more than --tolerance.
+
+With --startup the report also covers what a batch worker pays before and
+per run: the import time of model.py, pool start-up per start method, and
+peak memory per run.
+
+    python benchmark.py --out bench.json
+    python benchmark.py --sizes small medium --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import mesa
+
+from batch import run_model, worker_pool
+from events import SILENT
+from model import PetModel
+
+# name -> (grid side, pets, steps); pets are split evenly between dogs and cats
+SIZES = {
+    "tiny": (20, 10, 200),
+    "small": (50, 100, 200),
+    "medium": (200, 1_000, 100),
+    "large": (500, 10_000, 20),
+    "huge": (1000, 100_000, 5),
+}
+DEFAULT_SIZES = ("tiny", "small", "medium", "large")
+
+# Agent methods reported per configuration, as labelled by profiling.Profiler
+METHODS = ("seek_food", "seek_mate", "random_move", "try_reproduce_with", "hunt_target_animals")
+
+# Pool start methods compared by measure_startup, where the platform has them
+START_METHODS = ("fork", "forkserver", "spawn")
+
+# Phase name -> Profiler label
+PHASES = {"schedule.step": "schedule.step",
+          "check_business_intervention": "PetModel.check_business_intervention"}
+
+
+def build_model(side, pets, feeders=True, business=True, seed=0):
+    # With business on, the thresholds sit below the starting population so harvesters spawn at once
+    threshold = max(1, pets // 4) if business else 10 ** 9
+    return PetModel(width=side, height=side, num_dogs=pets // 2, num_cats=pets - pets // 2,
+                    num_feeders=max(1, pets // 50) if feeders else 0,
+                    dog_harvest_threshold=threshold, cat_harvest_threshold=threshold,
+                    seed=seed, verbosity=SILENT)
+
+
+def read_counts(model):
+    return (model.dog_count, model.cat_count, model.food_count, model.feeder_count,
+            model.business_agents_active)
+
+
+def measure_throughput(side, pets, steps, repeats=5, **options):
+    """Steps/second of the fastest of `repeats` identical runs, which is the least disturbed by other load"""
+    best = None
+    for _ in range(repeats):
+        model = build_model(side, pets, **options)
+        model.step()  # warm-up: fills neighbourhood caches and spawns business agents
+        done = 0
+        start = time.perf_counter()
+        while done < steps and model.running:
+            model.step()
+            done += 1
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[1]:
+            best = (done, elapsed)
+    done, elapsed = best
+    return {"steps": done, "seconds": elapsed, "steps_per_sec": done / elapsed if elapsed else 0.0}
+
+
+def measure_breakdown(side, pets, steps, folded=None, repeats=5, **options):
+    """
+    Per-phase and per-method seconds per step from `repeats` identical
+    profiled runs, taking each label's fastest run
+    """
+    totals = {}
+    for repeat in range(repeats):
+        model = build_model(side, pets, **options)
+        model.step()
+        profiler = model.enable_profiling()
+        done = 0
+        while done < steps and model.running:
+            model.step()
+            done += 1
+        model.disable_profiling()
+        if folded and repeat == 0:
+            profiler.write_folded(folded)
+        for label, (calls, seconds) in profiler.totals()["methods"].items():
+            if label not in totals or seconds < totals[label][1]:
+                totals[label] = (calls, seconds)
+
+    per_step = max(done, 1)
+    phases = {name: totals.get(label, (0, 0.0))[1] / per_step for name, label in PHASES.items()}
+    methods = {}
+    for label, (calls, seconds) in totals.items():
+        if label.split(".")[-1] in METHODS:
+            methods[label] = {"calls_per_step": calls / per_step,
+                              "seconds_per_step": seconds / per_step,
+                              "us_per_call": 1e6 * seconds / calls}
+    return {
+        "phases": phases,
+        "methods": methods,
+        "final_population": dict(zip(("dogs", "cats", "food", "feeders", "business"), read_counts(model))),
+    }
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, or None where unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def _probe_run(steps):
+    """One short batch run in a pool worker: its seconds and the worker's peak memory"""
+    start = time.perf_counter()
+    run_model(steps, seed=0)
+    return time.perf_counter() - start, peak_rss()
+
+
+def measure_startup(steps=20, runs=5, repeats=3):
+    """
+    Start-up and per-run cost of batch runs: the import time of model.py in a
+    fresh interpreter; per start method, how long the first and a second pool
+    take to return their first run, the time per further run and the worker's
+    peak memory; and the peak memory allocated by one run_model call.
+    """
+    code = "import time; t = time.perf_counter(); import model; print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    import_seconds = min(float(subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True,
+                                              text=True, check=True).stdout) for _ in range(repeats))
+    pools = {}
+    for method in START_METHODS:
+        if method not in multiprocessing.get_all_start_methods():
+            continue
+        result = {}
+        # A forkserver is started once per process, so only the first pool pays for it
+        for label in ("first_pool_seconds", "next_pool_seconds"):
+            start = time.perf_counter()
+            with worker_pool(1, method) as pool:
+                pool.apply(_probe_run, (steps,))
+                result[label] = time.perf_counter() - start
+                later = [pool.apply(_probe_run, (steps,)) for _ in range(runs)]
+        result["run_seconds"] = min(seconds for seconds, _ in later)
+        result["worker_peak_rss"] = later[-1][1]
+        pools[method] = result
+        print(f"{method:<12} first pool {result['first_pool_seconds']:6.3f}s  "
+              f"next pool {result['next_pool_seconds']:6.3f}s", file=sys.stderr)
+
+    tracemalloc.start()
+    run_model(steps, seed=0)
+    run_peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"steps": steps, "import_seconds": import_seconds, "pools": pools, "run_peak_bytes": run_peak_bytes}
+
+
+def run_suite(sizes=DEFAULT_SIZES, steps=None, feeders=(True, False), business=(True, False), seed=0,
+              folded_dir=None, repeats=5):
+    results = {}
+    for size in sizes:
+        side, pets, default_steps = SIZES[size]
+        for with_feeders in feeders:
+            for with_business in business:
+                name = f"{size}-{'feeders' if with_feeders else 'nofeeders'}-{'business' if with_business else 'nobusiness'}"
+                options = {"feeders": with_feeders, "business": with_business, "seed": seed}
+                n = steps or default_steps
+                result = {"grid": side, "pets": pets, **options}
+                result.update(measure_throughput(side, pets, n, repeats, **options))
+                folded = os.path.join(folded_dir, name + ".folded") if folded_dir else None
+                result.update(measure_breakdown(side, pets, n, folded=folded, repeats=repeats, **options))
+                results[name] = result
+                print(f"{name:<36} {result['steps_per_sec']:10.1f} steps/s", file=sys.stderr)
+    return {
+        "meta": {"python": platform.python_version(), "mesa": mesa.__version__,
+                 "machine": platform.machine(), "seed": seed, "repeats": repeats},
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=0.1):
+    """
+    Regressions of current against baseline as a list of messages: steps/s
+    dropping, or a phase or method costing more per step, or (with --startup)
+    the peak memory per run growing, by more than tolerance.
+    """
+    regressions = []
+    # Timings of a single pool start are too noisy to compare; memory per run is not
+    if "startup" in current and "startup" in baseline:
+        peak, base_peak = current["startup"]["run_peak_bytes"], baseline["startup"]["run_peak_bytes"]
+        if peak > base_peak * (1 + tolerance):
+            regressions.append(f"startup: peak memory per run {base_peak / 1024:.0f} -> {peak / 1024:.0f} KiB")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if result["steps_per_sec"] < base["steps_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {base['steps_per_sec']:.1f} -> {result['steps_per_sec']:.1f} steps/s")
+        timings = [(f"phase {phase}", seconds, base["phases"].get(phase))
+                   for phase, seconds in result["phases"].items()]
+        timings += [(f"method {label}", stats["seconds_per_step"], base["methods"].get(label, {}).get("seconds_per_step"))
+                    for label, stats in result["methods"].items()]
+        for label, seconds, base_seconds in timings:
+            # Ignore timings under 0.1 ms per step: a few calls, dominated by timer overhead
+            if base_seconds and seconds > 1e-4 and seconds > base_seconds * (1 + tolerance):
+                regressions.append(f"{name}: {label} {1e3 * base_seconds:.3f} -> {1e3 * seconds:.3f} ms/step")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PetModel throughput and hot paths")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(DEFAULT_SIZES))
+    parser.add_argument("--steps", type=int, default=None, help="override the steps per size")
+    parser.add_argument("--feeders", choices=("on", "off", "both"), default="both")
+    parser.add_argument("--business", choices=("on", "off", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per configuration; the fastest is reported")
+    parser.add_argument("--folded-dir", default=None, help="write flamegraph folded stacks per configuration here")
+    parser.add_argument("--startup", action="store_true", help="also measure import, pool start-up and per-run memory")
+    args = parser.parse_args(argv)
+    if args.folded_dir:
+        os.makedirs(args.folded_dir, exist_ok=True)
+
+    toggles = {"on": (True,), "off": (False,), "both": (True, False)}
+    report = run_suite(args.sizes, args.steps, toggles[args.feeders], toggles[args.business], args.seed,
+                       args.folded_dir, args.repeats)
+    if args.startup:
+        report["startup"] = measure_startup()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for message in regressions:
+            print("REGRESSION", message, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
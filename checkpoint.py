@@ -0,0 +1,225 @@
+"""
+Versioned binary checkpoints of a full PetModel.
+
+Layout: MAGIC, a u32 format version, then one 64-byte aligned raw array per
+section, written one after another as they are produced, and finally a JSON
+index of the sections plus the model scalars, its length (u64) and END_MAGIC.
+Loading reads the index from the tail and memory-maps every section.
+"""
+import json
+import struct
+from mesa import Agent
+import numpy as np
+
+from agents import DogAgent, CatAgent, FeederAgent, FoodMarker, BusinessAgent
+
+MAGIC = b"PETCKPT\x00"
+END_MAGIC = b"PETCKEND"
+FORMAT_VERSION = 4
+ALIGNMENT = 64
+
+# Per-agent attributes saved besides unique_id and pos; per-class constants are not saved
+AGENT_FIELDS = {
+    DogAgent: ("age", "max_age", "reproduction_cooldown", "hunger", "energy", "state", "health"),
+    CatAgent: ("age", "max_age", "reproduction_cooldown", "hunger", "sleepiness", "state", "health"),
+    FeederAgent: ("state", "food_dropped_count", "cooldown"),
+    BusinessAgent: ("state", "money_earned", "animals_collected", "steps_taken", "price_per_dog", "price_per_cat",
+                    "target_species"),
+    FoodMarker: ("born",),
+}
+
+# Model attributes saved as plain scalars
+MODEL_FIELDS = ("step_count", "next_agent_id", "running", "dog_harvest_threshold", "cat_harvest_threshold",
+                "max_business_agents", "total_births", "total_deaths", "total_harvested", "total_money_made",
+                "deaths_by_cause")
+
+
+class CheckpointWriter:
+    """Streams named array sections to a checkpoint file and writes the index on close"""
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._file.write(MAGIC + struct.pack("<I", FORMAT_VERSION))
+        self.sections = {}
+
+    def write_array(self, name, values):
+        values = np.ascontiguousarray(values)
+        offset = self._file.tell()
+        padding = -offset % ALIGNMENT
+        self._file.write(b"\x00" * padding)
+        self.sections[name] = {"offset": offset + padding, "dtype": values.dtype.str, "shape": values.shape}
+        self._file.write(values.tobytes())
+
+    def write_column(self, name, values):
+        """Write a list of Python values; strings are dictionary-encoded"""
+        if values and all(isinstance(v, str) or v is None for v in values):
+            vocab = sorted({v for v in values if v is not None})
+            lookup = {v: i for i, v in enumerate(vocab)}
+            self.write_array(name, np.array([lookup[v] if v is not None else -1 for v in values], dtype=np.int32))
+            self.sections[name]["vocab"] = vocab
+        else:
+            self.write_array(name, np.array(values))
+
+    def close(self, meta):
+        index = json.dumps({"sections": self.sections, "meta": meta}).encode()
+        self._file.write(index + struct.pack("<Q", len(index)) + END_MAGIC)
+        self._file.close()
+
+
+class CheckpointReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(len(MAGIC) + 4)
+            if head[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a PetModel checkpoint")
+            (self.version,) = struct.unpack("<I", head[len(MAGIC):])
+            if self.version != FORMAT_VERSION:
+                raise ValueError(f"{path} has checkpoint format {self.version}, expected {FORMAT_VERSION}")
+            f.seek(-(8 + len(END_MAGIC)), 2)
+            tail = f.read()
+            if tail[8:] != END_MAGIC:
+                raise ValueError(f"{path} is truncated")
+            (index_len,) = struct.unpack("<Q", tail[:8])
+            f.seek(-(8 + len(END_MAGIC) + index_len), 2)
+            index = json.loads(f.read(index_len))
+        self.sections = index["sections"]
+        self.meta = index["meta"]
+
+    def array(self, name):
+        section = self.sections[name]
+        shape = tuple(section["shape"])
+        if not np.prod(shape):
+            return np.zeros(shape, dtype=section["dtype"])
+        return np.memmap(self.path, dtype=section["dtype"], mode="r", offset=section["offset"], shape=shape)
+
+    def column(self, name):
+        values = self.array(name)
+        vocab = self.sections[name].get("vocab")
+        if vocab is None:
+            return values.tolist()
+        return [vocab[i] if i >= 0 else None for i in values.tolist()]
+
+
+def save_checkpoint(model, path):
+    writer = CheckpointWriter(path)
+
+    version, rng_state, gauss = model.random.getstate()
+    writer.write_array("rng", np.array(rng_state, dtype=np.uint32))
+
+    # Grid placement order decides the agent order inside each cell
+    placement = {}
+    for blocks in model.spatial._buckets.values():
+        for block in blocks.values():
+            for cell in block.values():
+                for seq, agent in cell:
+                    placement[agent.unique_id] = seq
+
+    for cls, fields in AGENT_FIELDS.items():
+        agents = list(model.live_agents[cls].values())
+        name = cls.__name__
+        writer.write_array(f"{name}.unique_id", np.array([a.unique_id for a in agents], dtype=np.int64))
+        writer.write_array(f"{name}.pos", np.array([a.pos for a in agents], dtype=np.int32).reshape(-1, 2))
+        writer.write_array(f"{name}.placement", np.array([placement[a.unique_id] for a in agents], dtype=np.int64))
+        for field in fields:
+            writer.write_column(f"{name}.{field}", [getattr(a, field) for a in agents])
+
+    # A diffusing food scent carries history the food positions alone cannot rebuild
+    if model.food_field is not None and model.food_field.diffusion:
+        writer.write_array("food_scent", model.food_field.scent)
+
+    # Activation order, which RandomActivation shuffles in place every step
+    writer.write_array("schedule", np.array([a.unique_id for a in model.schedule.agents], dtype=np.int64))
+    if model.scheduler == "event":
+        events = model.schedule.pending()
+        writer.write_array("events.tick", np.array([tick for tick, _, _ in events], dtype=np.int64))
+        writer.write_array("events.unique_id", np.array([uid for _, uid, _ in events], dtype=np.int64))
+        writer.write_column("events.action", [action for _, _, action in events])
+
+    meta = {field: getattr(model, field) for field in MODEL_FIELDS}
+    meta.update({
+        "width": model.grid.width,
+        "height": model.grid.height,
+        "seed": model._seed,
+        "rng_version": version,
+        "rng_gauss": gauss,
+        "fingerprint": model.fingerprint,
+        "scheduler": model.scheduler,
+        "world": model.world,
+        "chunk_size": model.chunk_size,
+        "food_search": model.food_search,
+        "scent_diffusion": model.scent_diffusion,
+        "mate_search": model.mate_search,
+        "fast_forward": model.fast_forward,
+        "mesa_steps": model._steps,
+        "mesa_time": model._time,
+        "schedule_steps": model.schedule.steps,
+        "schedule_time": model.schedule.time,
+    })
+    writer.close(meta)
+
+
+def load_checkpoint(path, model_cls, **model_kwargs):
+    """Rebuild a model of model_cls from a checkpoint; model_kwargs are passed to its constructor"""
+    reader = CheckpointReader(path)
+    meta = reader.meta
+
+    # Food and suspended agents are only reachable through an event scheduler's queue
+    model_kwargs.setdefault("scheduler", meta["scheduler"])
+    # A chunked world is never rebuilt as a dense grid as large as the whole map
+    model_kwargs.setdefault("world", meta.get("world", "dense"))
+    model_kwargs.setdefault("chunk_size", meta.get("chunk_size", 64))
+    # Without these a field-mode run would resume searching exactly and drop its saved scent
+    model_kwargs.setdefault("food_search", meta.get("food_search", "exact"))
+    model_kwargs.setdefault("scent_diffusion", meta.get("scent_diffusion", 0.0))
+    model_kwargs.setdefault("mate_search", meta.get("mate_search", "exact"))
+    model_kwargs.setdefault("fast_forward", meta.get("fast_forward", False))
+    model = model_cls(width=meta["width"], height=meta["height"], num_dogs=0, num_cats=0, num_feeders=0,
+                      seed=meta["seed"], **model_kwargs)
+    for field in MODEL_FIELDS:
+        setattr(model, field, meta[field])
+    model._steps = meta["mesa_steps"]
+    model._time = meta["mesa_time"]
+    model.schedule.steps = meta["schedule_steps"]
+    model.schedule.time = meta["schedule_time"]
+
+    by_id = {}
+    placed = []
+    for cls, fields in AGENT_FIELDS.items():
+        name = cls.__name__
+        ids = reader.array(f"{name}.unique_id").tolist()
+        positions = reader.array(f"{name}.pos").tolist()
+        placement = reader.array(f"{name}.placement").tolist()
+        columns = [reader.column(f"{name}.{field}") for field in fields]
+        for i, unique_id in enumerate(ids):
+            # Bypass __init__, which would draw from the RNGs
+            agent = cls.__new__(cls)
+            Agent.__init__(agent, unique_id, model)
+            for field, column in zip(fields, columns):
+                setattr(agent, field, column[i])
+            by_id[unique_id] = agent
+            placed.append((placement[i], agent, tuple(positions[i])))
+
+    # Re-placing in the original order restores the agent order within each cell
+    placed.sort(key=lambda p: p[0])
+    for _, agent, pos in placed:
+        model.grid.place_agent(agent, pos)
+    for cls in AGENT_FIELDS:
+        for unique_id in sorted(a.unique_id for a in by_id.values() if type(a) is cls):
+            model.live_agents[cls][unique_id] = by_id[unique_id]
+    for unique_id in reader.array("schedule").tolist():
+        model.schedule.add(by_id[unique_id])
+    if "events.tick" in reader.sections:
+        for tick, unique_id, action in zip(reader.array("events.tick").tolist(),
+                                           reader.array("events.unique_id").tolist(),
+                                           reader.column("events.action")):
+            model.schedule.at(tick, by_id[unique_id], action)
+
+    if model.food_field is not None:
+        scent = reader.array("food_scent") if "food_scent" in reader.sections else None
+        model.food_field.restore([food.pos for food in model.live_agents[FoodMarker].values()], scent)
+
+    model.random.setstate((meta["rng_version"], tuple(reader.array("rng").tolist()), meta["rng_gauss"]))
+    # Carry the fingerprint chain on if the restored model keeps one
+    if model.fingerprint is not None and meta["fingerprint"] is not None:
+        model.fingerprint = meta["fingerprint"]
+    return model
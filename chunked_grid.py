@@ -0,0 +1,101 @@
+from itertools import chain
+
+from mesa.space import MultiGrid, accept_tuple_argument
+
+
+class ChunkedGrid:
+    """
+    Sparse multi-agent grid made of square chunks allocated on demand.
+
+    Only cells holding agents are stored: each chunk maps its occupied cells to
+    their agent lists, a chunk is created when an agent enters it and dropped
+    when its last agent leaves. Memory therefore follows the occupied area, not
+    width * height. Positions, torus wrapping and neighbourhoods (including
+    their order) are exactly those of MultiGrid, which supplies get_neighborhood.
+    """
+    # Neighbourhoods are cached like MultiGrid does, but the cache is emptied
+    # once it holds this many entries so it cannot grow with the map area
+    max_cached_neighborhoods = 1 << 16
+
+    def __init__(self, width, height, torus, chunk_size=64):
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.num_cells = width * height
+        self.chunk_size = chunk_size
+        # (chunk x, chunk y) -> {pos: [agents in placement order]}
+        self._chunks = {}
+        self._neighborhood_cache = {}
+
+    torus_adj = MultiGrid.torus_adj
+    out_of_bounds = MultiGrid.out_of_bounds
+    move_agent = MultiGrid.move_agent
+
+    @staticmethod
+    def default_val():
+        return []
+
+    def get_neighborhood(self, pos, moore, include_center=False, radius=1):
+        if len(self._neighborhood_cache) >= self.max_cached_neighborhoods:
+            self._neighborhood_cache.clear()
+        return MultiGrid.get_neighborhood(self, pos, moore, include_center, radius)
+
+    def chunk_of(self, pos):
+        return pos[0] // self.chunk_size, pos[1] // self.chunk_size
+
+    def active_chunks(self):
+        """Keys of the chunks currently holding agents; every other chunk is empty"""
+        return self._chunks.keys()
+
+    def agents_in_chunk(self, key):
+        chunk = self._chunks.get(key)
+        return [] if chunk is None else list(chain.from_iterable(chunk.values()))
+
+    def place_agent(self, agent, pos):
+        key = (pos[0] // self.chunk_size, pos[1] // self.chunk_size)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = self._chunks[key] = {}
+        cell = chunk.get(pos)
+        if cell is None:
+            cell = chunk[pos] = []
+        if agent.pos is None or agent not in cell:
+            cell.append(agent)
+            agent.pos = pos
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        key = (pos[0] // self.chunk_size, pos[1] // self.chunk_size)
+        chunk = self._chunks[key]
+        cell = chunk[pos]
+        cell.remove(agent)
+        if not cell:
+            del chunk[pos]
+            if not chunk:
+                del self._chunks[key]
+        agent.pos = None
+
+    def is_cell_empty(self, pos):
+        chunk = self._chunks.get((pos[0] // self.chunk_size, pos[1] // self.chunk_size))
+        return chunk is None or pos not in chunk
+
+    def _cell(self, pos):
+        chunk = self._chunks.get((pos[0] // self.chunk_size, pos[1] // self.chunk_size))
+        return None if chunk is None else chunk.get(pos)
+
+    @accept_tuple_argument
+    def iter_cell_list_contents(self, cell_list):
+        for pos in cell_list:
+            cell = self._cell(pos)
+            if cell:
+                yield from cell
+
+    @accept_tuple_argument
+    def get_cell_list_contents(self, cell_list):
+        return list(self.iter_cell_list_contents(cell_list))
+
+    def get_neighbors(self, pos, moore, include_center=False, radius=1):
+        return list(self.iter_cell_list_contents(self.get_neighborhood(pos, moore, include_center, radius)))
+
+    def exists_empty_cells(self):
+        return sum(len(chunk) for chunk in self._chunks.values()) < self.num_cells
@@ -0,0 +1,78 @@
+import json
+import os
+import numpy as np
+
+SCHEMA_FILE = "schema.json"
+
+
+class ColumnWriter:
+    """
+    Append-only columnar store: a directory holding one raw little-endian
+    file per column plus schema.json with the column dtypes. Rows are
+    streamed to disk as they are appended, so nothing accumulates in memory,
+    and an existing store with the same schema is appended to.
+    """
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = {name: np.dtype(dtype).newbyteorder("<") for name, dtype in columns.items()}
+        os.makedirs(path, exist_ok=True)
+
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        schema = {name: dtype.str for name, dtype in self.columns.items()}
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                existing = json.load(f)["columns"]
+            if existing != schema:
+                raise ValueError(f"{path} already holds columns {existing}, expected {schema}")
+        else:
+            with open(schema_path, "w") as f:
+                json.dump({"columns": schema}, f, indent=2)
+
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), "ab") for name in self.columns}
+
+    def append(self, rows):
+        """Append a block of rows given as {column: array-like}; all columns must be present"""
+        length = None
+        for name, dtype in self.columns.items():
+            values = np.asarray(rows[name], dtype=dtype)
+            if values.ndim == 0:
+                continue
+            if length is None:
+                length = len(values)
+            elif len(values) != length:
+                raise ValueError(f"column {name} has {len(values)} rows, expected {length}")
+        length = 1 if length is None else length
+        for name, dtype in self.columns.items():
+            # Scalars are broadcast over the block
+            values = np.broadcast_to(np.asarray(rows[name], dtype=dtype), (length,))
+            self._files[name].write(np.ascontiguousarray(values).tobytes())
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_columns(path, mmap=True):
+    """Load a ColumnWriter directory as {column: array}, memory-mapped by default"""
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)["columns"]
+    columns = {}
+    for name, dtype in schema.items():
+        file_path = os.path.join(path, f"{name}.bin")
+        if mmap and os.path.getsize(file_path) > 0:
+            columns[name] = np.memmap(file_path, dtype=np.dtype(dtype), mode="r")
+        else:
+            columns[name] = np.fromfile(file_path, dtype=np.dtype(dtype))
+    # A writer killed mid-append can leave some columns one block longer
+    rows = min((len(col) for col in columns.values()), default=0)
+    return {name: col[:rows] for name, col in columns.items()}
@@ -0,0 +1,104 @@
+"""
+Delta-encoded grid visualization element.
+
+Instead of a full portrayal list per frame, DeltaGrid sends only the agents
+that spawned, moved or changed since the last frame it sent, plus the ids of
+removed agents, as base64-packed int32 rows:
+
+    unique_id, x, y, style, label, value
+
+The static part of each portrayal (shape, layer, colour, ...) is a named
+style sent once per model; `label` indexes a string table that is also only
+sent when it grows, and `value` is a per-agent number the style's text
+template can refer to. Templates may use {label}, {value} and {age}, which
+the browser computes as current step - value, so an agent whose value is its
+birth step does not change from frame to frame as it ages.
+
+Frames are rendered at most max_fps times per second; renders in between are
+skipped (the next frame diffs against the last one sent), and the browser
+applies every frame but only repaints at animation-frame rate.
+"""
+import base64
+import os
+import time
+
+import numpy as np
+from mesa.visualization.ModularVisualization import VisualizationElement
+
+ROW_FIELDS = ("unique_id", "x", "y", "style", "label", "value")
+
+
+def _pack(values):
+    return base64.b64encode(np.asarray(values, dtype="<i4").tobytes()).decode("ascii")
+
+
+class DeltaGrid(VisualizationElement):
+    """
+    Grid element drawn from deltas. `styles` maps style names to static
+    portrayal dicts in CanvasGrid format, where "text" is a template and
+    "age_color": true colours the agent by {age} like an ageing food marker.
+    `portrayal(agent)` returns (style name, label string or None, value int).
+    """
+    # GridDraw.js and InteractionHandler.js are mesa's, the drawing code CanvasGrid uses too
+    package_includes = ["GridDraw.js", "InteractionHandler.js"]
+    local_includes = ["DeltaGridModule.js"]
+    local_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js")
+
+    def __init__(self, portrayal, styles, grid_width, grid_height, canvas_width=500, canvas_height=500,
+                 max_fps=30):
+        super().__init__()
+        self.portrayal = portrayal
+        self.style_names = list(styles)
+        self.styles = [styles[name] for name in self.style_names]
+        self._style_ids = {name: i for i, name in enumerate(self.style_names)}
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.js_code = (f"elements.push(new DeltaGridModule({canvas_width}, {canvas_height}, "
+                        f"{grid_width}, {grid_height}, {max_fps or 0}));")
+        self._model = None
+
+    def _reset(self, model):
+        self._model = model
+        self._sent = {}
+        self._labels = {}
+        self._last_frame = float("-inf")
+
+    def render(self, model):
+        full = model is not self._model
+        if full:
+            self._reset(model)
+        elif model.running and time.monotonic() - self._last_frame < self.min_interval:
+            return {"skip": True}
+        self._last_frame = time.monotonic()
+
+        new_labels = {}
+        current = {}
+        changed = []
+        sent = self._sent
+        for agents in model.live_agents.values():
+            for unique_id, agent in agents.items():
+                if agent.pos is None:
+                    continue
+                style, label, value = self.portrayal(agent)
+                if label is None:
+                    label_id = -1
+                else:
+                    label_id = self._labels.get(label)
+                    if label_id is None:
+                        label_id = self._labels[label] = new_labels[label] = len(self._labels)
+                row = (unique_id, agent.pos[0], agent.pos[1], self._style_ids[style], label_id, value)
+                current[unique_id] = row
+                if sent.get(unique_id) != row:
+                    changed.append(row)
+        removed = [unique_id for unique_id in sent if unique_id not in current]
+        self._sent = current
+
+        frame = {
+            "full": full,
+            "step": model.step_count,
+            "rows": _pack(changed),
+            "removed": _pack(removed),
+            "labels": {label_id: label for label, label_id in new_labels.items()},
+        }
+        if full:
+            frame["styles"] = self.styles
+        return frame
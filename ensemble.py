@@ -0,0 +1,313 @@
+"""
+Ensemble statistics over replicate runs of one configuration.
+
+Each replicate's per-step series are folded into streaming aggregates as soon
+as the run finishes and then dropped, so memory does not grow with the number
+of replicates: per-step mean and variance (Welford), per-step quantile
+sketches and extinction-time histograms. With a target confidence interval
+width, replicates stop as soon as the chosen metrics' means (by default the
+dog and cat counts) are known that precisely at every step.
+
+    python ensemble.py --steps 500 --replicates 500 --ci-width 2 --num-dogs 8 --num-cats 8
+
+A run that ends early because all pets died is continued with its final
+values, so every replicate contributes to every step.
+"""
+import argparse
+import multiprocessing
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from batch import ENGINES, SWEEP_PARAMS, engine_accepts, resolve_params, run_model, worker_pool
+
+ENSEMBLE_METRICS = ("dog_count", "cat_count", "food_count", "total_harvested", "total_money_made")
+
+# Metrics an early stop on ci_width waits for unless told otherwise; the others
+# are on different scales (money runs into the thousands)
+CI_METRICS = ("dog_count", "cat_count")
+
+
+class RunningStats:
+    """Welford mean and variance of equally shaped arrays, one array per replicate"""
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def add(self, values):
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (values - self.mean)
+
+    @property
+    def variance(self):
+        """Sample variance (zero until there are two replicates)"""
+        if self.count < 2:
+            return np.zeros_like(self._m2)
+        return self._m2 / (self.count - 1)
+
+    def ci_halfwidth(self, confidence=0.95):
+        """Half-width of the normal confidence interval of the mean"""
+        if self.count < 2:
+            return np.full_like(self._m2, np.inf)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * np.sqrt(self.variance / self.count)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histograms of non-negative values, one per array element
+    (a DDSketch). Quantiles come back within relative_error of a true value,
+    and memory depends on the value range, not on the number of replicates.
+    """
+    def __init__(self, shape, relative_error=0.01):
+        self.shape = shape
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = np.log(self.gamma)
+        # Bucket 0 counts zeros; bucket k + 1 counts values in (gamma^(k-1), gamma^k]
+        self.counts = np.zeros(tuple(shape) + (1,), dtype=np.int64)
+        self.count = 0
+
+    def _buckets(self, values):
+        values = np.asarray(values, dtype=float)
+        buckets = np.zeros(values.shape, dtype=np.int64)
+        positive = values > 0
+        buckets[positive] = np.ceil(np.log(values[positive]) / self._log_gamma).astype(np.int64) + 1
+        return np.maximum(buckets, 0)
+
+    def add(self, values):
+        buckets = self._buckets(values)
+        needed = int(buckets.max()) + 1
+        if needed > self.counts.shape[-1]:
+            grown = np.zeros(tuple(self.shape) + (needed,), dtype=np.int64)
+            grown[..., :self.counts.shape[-1]] = self.counts
+            self.counts = grown
+        width = self.counts.shape[-1]
+        np.add.at(self.counts.reshape(-1), np.arange(buckets.size) * width + buckets.ravel(), 1)
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimated q-quantile per element"""
+        if not self.count:
+            return np.full(self.shape, np.nan)
+        rank = q * (self.count - 1)
+        bucket = (np.cumsum(self.counts, axis=-1) > rank).argmax(axis=-1)
+        # Midpoint of the bucket in relative terms; zeros stay zero
+        return np.where(bucket == 0, 0.0, 2 * self.gamma ** (bucket - 1.0) / (self.gamma + 1))
+
+
+class Ensemble:
+    """Streaming aggregates of ENSEMBLE_METRICS over the replicates added so far"""
+    def __init__(self, steps, relative_error=0.01):
+        self.steps = steps
+        shape = (len(ENSEMBLE_METRICS), steps)
+        self.stats = RunningStats(shape)
+        self.sketch = QuantileSketch(shape, relative_error)
+        # Step at which the pets (all of them, dogs, cats) died out; the last slot counts survivors
+        self.extinction = {name: np.zeros(steps + 1, dtype=np.int64) for name in ("pets", "dogs", "cats")}
+        self.seeds = []
+
+    @property
+    def replicates(self):
+        return self.stats.count
+
+    def add(self, series, seed=None):
+        """Fold in one run's series as returned by batch.run_model"""
+        done = len(series["step"])
+        values = np.zeros((len(ENSEMBLE_METRICS), self.steps))
+        for row, name in enumerate(ENSEMBLE_METRICS):
+            run = np.asarray(series[name][:self.steps], dtype=float)
+            values[row, :done] = run
+            if done:
+                values[row, done:] = run[-1]
+        self.stats.add(values)
+        self.sketch.add(values)
+        dogs = values[ENSEMBLE_METRICS.index("dog_count")]
+        cats = values[ENSEMBLE_METRICS.index("cat_count")]
+        for name, alive in (("pets", dogs + cats), ("dogs", dogs), ("cats", cats)):
+            dead = np.flatnonzero(alive == 0)
+            self.extinction[name][dead[0] if len(dead) else self.steps] += 1
+        self.seeds.append(seed)
+
+    def _row(self, metric):
+        return ENSEMBLE_METRICS.index(metric)
+
+    def mean(self, metric):
+        return self.stats.mean[self._row(metric)]
+
+    def std(self, metric):
+        return np.sqrt(self.stats.variance[self._row(metric)])
+
+    def ci(self, metric, confidence=0.95):
+        """(low, high) confidence bounds of the per-step mean"""
+        half = self.stats.ci_halfwidth(confidence)[self._row(metric)]
+        mean = self.mean(metric)
+        return mean - half, mean + half
+
+    def quantile(self, metric, q):
+        return self.sketch.quantile(q)[self._row(metric)]
+
+    def extinction_probability(self, name="pets"):
+        """Fraction of replicates extinct by each step"""
+        return np.cumsum(self.extinction[name][:self.steps]) / max(1, self.replicates)
+
+    def ci_width(self, confidence=0.95, metrics=ENSEMBLE_METRICS):
+        """Widest confidence interval of the given metrics' means at any step"""
+        rows = [self._row(metric) for metric in metrics]
+        return float(2 * self.stats.ci_halfwidth(confidence)[rows].max())
+
+    def summary(self, step=-1, confidence=0.95):
+        """Per-metric statistics at one step (the last by default)"""
+        out = {"replicates": self.replicates, "step": step % self.steps + 1,
+               "extinct": float(self.extinction_probability()[step])}
+        for metric in ENSEMBLE_METRICS:
+            low, high = self.ci(metric, confidence)
+            out[metric] = {"mean": float(self.mean(metric)[step]), "std": float(self.std(metric)[step]),
+                           "ci": (float(low[step]), float(high[step])),
+                           "median": float(self.quantile(metric, 0.5)[step]),
+                           "p05": float(self.quantile(metric, 0.05)[step]),
+                           "p95": float(self.quantile(metric, 0.95)[step])}
+        return out
+
+
+def _run_replicate(task):
+    steps, seed, engine, params = task
+    series = run_model(steps, seed=seed, engine=engine, **params)
+    return seed, {name: series[name] for name in ("step",) + ENSEMBLE_METRICS}
+
+
+def run_ensemble(steps, replicates, params=None, engine="agent", seed_start=0, processes=None,
+                 ci_width=None, confidence=0.95, min_replicates=10, relative_error=0.01, start_method=None,
+                 ci_metrics=CI_METRICS):
+    """
+    Run up to `replicates` seeded replicates (seeds seed_start, seed_start + 1, ...)
+    of one parameter set and return their Ensemble. processes=0 or 1 runs them
+    in-process, otherwise on a batch.worker_pool started with start_method.
+    With ci_width, stops once min_replicates have run and every per-step
+    confidence interval of the ci_metrics is at most that wide.
+    Replicates are folded in seed order, so the result does not depend on the pool.
+    """
+    # Rejects parameters the engine does not take here rather than in every worker
+    params = resolve_params(engine, params or {})
+    ensemble = Ensemble(steps, relative_error)
+    tasks = ((steps, seed, engine, params) for seed in range(seed_start, seed_start + replicates))
+
+    def done():
+        return (ci_width is not None and ensemble.replicates >= min_replicates
+                and ensemble.ci_width(confidence, ci_metrics) <= ci_width)
+
+    if processes is not None and processes <= 1:
+        for task in tasks:
+            seed, series = _run_replicate(task)
+            ensemble.add(series, seed)
+            if done():
+                break
+        return ensemble
+
+    pool = worker_pool(processes, start_method)
+    try:
+        for seed, series in pool.imap(_run_replicate, tasks):
+            ensemble.add(series, seed)
+            if done():
+                break
+    finally:
+        # Replicates still running after an early stop are not needed
+        pool.terminate()
+        pool.join()
+    return ensemble
+
+
+def compare_ensembles(reference, other):
+    """
+    How far other's per-step means stray from reference's, per metric: the
+    largest absolute difference over all steps, the difference at the last
+    step, and the largest difference in standard errors of the difference
+    (Welch z; taken over hundreds of steps, a maximum near 3 is still noise)
+    """
+    report = {}
+    for metric in ENSEMBLE_METRICS:
+        diff = other.mean(metric) - reference.mean(metric)
+        se = np.sqrt(reference.std(metric) ** 2 / max(1, reference.replicates)
+                     + other.std(metric) ** 2 / max(1, other.replicates))
+        z = np.abs(diff) / np.where(se > 0, se, np.inf)
+        report[metric] = {"max_abs": float(np.abs(diff).max()), "final": float(diff[-1]),
+                          "final_rel": float(diff[-1] / max(1.0, abs(reference.mean(metric)[-1]))),
+                          "max_z": float(z.max())}
+    report["extinct"] = float(other.extinction_probability()[-1] - reference.extinction_probability()[-1])
+    return report
+
+
+def fast_forward_error(steps, replicates, params=None, seed_start=0, processes=None, relative_error=0.01,
+                       start_method=None):
+    """
+    Run the same seeds with PetModel(fast_forward=True) and exactly (both on
+    the event scheduler) and return (report, exact seconds, fast-forward
+    seconds), the report being compare_ensembles(exact, fast_forward)
+    """
+    params = dict(params or {}, scheduler="event")
+    ensembles, seconds = [], []
+    for fast_forward in (False, True):
+        started = time.perf_counter()
+        ensembles.append(run_ensemble(steps, replicates, dict(params, fast_forward=fast_forward), seed_start=seed_start,
+                                      processes=processes, relative_error=relative_error,
+                                      start_method=start_method))
+        seconds.append(time.perf_counter() - started)
+    return compare_ensembles(*ensembles), seconds[0], seconds[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate replicate PetModel runs of one configuration")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--replicates", type=int, default=100, help="maximum number of replicates")
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="pool size, defaults to all cores")
+    parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(), default=None,
+                        help="how pool workers are started, defaults to the platform's")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="agent")
+    parser.add_argument("--ci-width", type=float, default=None,
+                        help="stop once every per-step confidence interval of --ci-metrics is at most this wide")
+    parser.add_argument("--ci-metrics", nargs="+", choices=ENSEMBLE_METRICS, default=list(CI_METRICS))
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--min-replicates", type=int, default=10)
+    parser.add_argument("--out", default=None, help="write the aggregates to this .npz file")
+    parser.add_argument("--fast-forward-error", action="store_true",
+                        help="report how far fast-forwarded runs stray from exact ones instead")
+    for name, default in SWEEP_PARAMS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=default)
+    args = parser.parse_args(argv)
+
+    params = {name: getattr(args, name) for name in SWEEP_PARAMS if engine_accepts(args.engine, name)}
+    if args.fast_forward_error:
+        report, exact, fast = fast_forward_error(args.steps, args.replicates, params, seed_start=args.seed_start,
+                                                 processes=args.processes, start_method=args.start_method)
+        print(f"{args.replicates} replicates: exact {exact:.1f}s, fast-forward {fast:.1f}s ({exact / fast:.2f}x); "
+              f"extinction probability {report['extinct']:+.3f}")
+        for metric in ENSEMBLE_METRICS:
+            r = report[metric]
+            print(f"  {metric:18} max |diff| {r['max_abs']:8.2f}  final {r['final']:+8.2f} "
+                  f"({r['final_rel']:+.1%})  max z {r['max_z']:.1f}")
+        return
+    ensemble = run_ensemble(args.steps, args.replicates, params, engine=args.engine, seed_start=args.seed_start,
+                            processes=args.processes, ci_width=args.ci_width, ci_metrics=args.ci_metrics,
+                            confidence=args.confidence, min_replicates=args.min_replicates,
+                            start_method=args.start_method)
+    summary = ensemble.summary(confidence=args.confidence)
+    print(f"{summary['replicates']} replicates, step {summary['step']}: {summary['extinct']:.0%} extinct, "
+          f"widest CI of {', '.join(args.ci_metrics)} {ensemble.ci_width(args.confidence, args.ci_metrics):.2f}")
+    for metric in ENSEMBLE_METRICS:
+        s = summary[metric]
+        print(f"  {metric:18} mean {s['mean']:10.2f}  CI [{s['ci'][0]:.2f}, {s['ci'][1]:.2f}]  "
+              f"median {s['median']:.1f}  p05-p95 [{s['p05']:.1f}, {s['p95']:.1f}]")
+    if args.out:
+        np.savez(args.out, metrics=np.array(ENSEMBLE_METRICS), mean=ensemble.stats.mean,
+                 variance=ensemble.stats.variance, ci_halfwidth=ensemble.stats.ci_halfwidth(args.confidence),
+                 median=ensemble.sketch.quantile(0.5), **{f"extinction_{name}": counts
+                                                          for name, counts in ensemble.extinction.items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import json
+import os
+import struct
+from enum import IntEnum
+import numpy as np
+
+# Verbosity levels for EventLog
+SILENT = 0    # nothing is recorded or printed
+QUIET = 1     # events are recorded, nothing is printed
+SUMMARY = 2   # events are recorded, periodic statistics are printed
+VERBOSE = 3   # every event is printed as well
+
+
+class EventType(IntEnum):
+    BIRTH = 1            # agent=parent, other=partner, value=offspring id
+    DEATH = 2            # agent=pet, value=index into DEATH_CAUSES
+    EAT = 3              # agent=pet, other=food
+    CAPTURE = 4          # agent=business agent, other=pet, value=price
+    CAPTURE_FAILED = 5   # agent=business agent, other=pet
+    FOOD_DROP = 6        # agent=feeder, other=food
+    FOOD_EXPIRY = 7      # agent=food
+    BUSINESS_SPAWN = 8   # agent=business agent, value=population that triggered it
+    BUSINESS_LEAVE = 9   # agent=business agent, other=animals collected, value=money earned
+
+
+DEATH_CAUSES = ("starvation", "old_age", "illness")
+SPECIES = ("dog", "cat")
+_SPECIES_CODES = {name: code for code, name in enumerate(SPECIES)}
+
+# One fixed-size record per event; species is -1 when it does not apply
+EVENT_DTYPE = np.dtype([("step", "<u4"), ("type", "u1"), ("species", "i1"),
+                        ("agent", "<i8"), ("other", "<i8"), ("value", "<i8")])
+
+MAGIC = b"PETEVT\x00\x01"
+
+
+def _species_name(code):
+    return SPECIES[code].capitalize()
+
+
+# Console messages for VERBOSE, built from the event fields and the live model
+FORMATTERS = {
+    EventType.BIRTH: lambda model, species, agent, other, value:
+        f"{_species_name(species)} {agent} mated with {other} - offspring {value}",
+    EventType.DEATH: lambda model, species, agent, other, value:
+        f"{_species_name(species)} {agent} died of {DEATH_CAUSES[value].replace('_', ' ')}",
+    EventType.EAT: lambda model, species, agent, other, value:
+        f"{_species_name(species)} {agent} ate food {other}",
+    EventType.CAPTURE: lambda model, species, agent, other, value:
+        (f"💼 BusinessAgent {agent} captured {_species_name(species)} {other} for ${value} "
+         f"(Total: {model.find_agent(agent).animals_collected}/{model.find_agent(agent).collection_target})"),
+    EventType.CAPTURE_FAILED: lambda model, species, agent, other, value:
+        f"BusinessAgent {agent} failed to capture {_species_name(species)}Agent {other}",
+    EventType.FOOD_DROP: lambda model, species, agent, other, value:
+        f"Feeder {agent} dropped food {other}",
+    EventType.FOOD_EXPIRY: lambda model, species, agent, other, value:
+        f"Food {agent} expired",
+    EventType.BUSINESS_SPAWN: lambda model, species, agent, other, value:
+        (f"🏢 BusinessAgent {agent} enters to harvest {SPECIES[species]}s "
+         f"due to {SPECIES[species]} overpopulation ({value})!"),
+    EventType.BUSINESS_LEAVE: lambda model, species, agent, other, value:
+        (f"BusinessAgent {agent} is leaving after {model.find_agent(agent).steps_taken} steps "
+         f"with {other} {SPECIES[species]}s, earned ${value}"),
+}
+
+
+class EventLog:
+    """
+    Typed event bus for a PetModel.
+
+    Events go into a preallocated ring buffer of EVENT_DTYPE records. With a
+    path, a full buffer is appended to that file in one write (and on flush()
+    or close()); without one, the oldest events are overwritten. An existing
+    event log at path is appended to, so a resumed run continues its log. In SILENT
+    mode emit() is a no-op and no buffer is allocated.
+    """
+    def __init__(self, model, verbosity=SUMMARY, path=None, capacity=65536):
+        self.model = model
+        self.verbosity = verbosity
+        self.path = path
+        self.buffer = np.zeros(capacity if verbosity != SILENT else 0, dtype=EVENT_DTYPE)
+        self.size = 0
+        self.total = 0
+        self._wrapped = False
+        self._file = None
+        if verbosity == SILENT:
+            self.emit = self._discard
+
+    def emit(self, kind, agent, other=-1, value=0, species=None):
+        code = _SPECIES_CODES[species] if species else -1
+        self.buffer[self.size] = (self.model.step_count, kind, code, agent, other, value)
+        self.size += 1
+        self.total += 1
+        if self.verbosity >= VERBOSE:
+            print(FORMATTERS[kind](self.model, code, agent, other, value))
+        if self.size == len(self.buffer):
+            self.flush()
+
+    def _discard(self, kind, agent, other=-1, value=0, species=None):
+        pass
+
+    def flush(self):
+        """Write buffered events to the log file, if there is one"""
+        if self.path is None:
+            if self.size == len(self.buffer):
+                self.size = 0
+                self._wrapped = True
+            return
+        if self._file is None:
+            self._file = self._open()
+        self._file.write(self.buffer[:self.size].tobytes())
+        self._file.flush()
+        self.size = 0
+
+    def _open(self):
+        """Open the log file for appending, writing the header if it is new"""
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{self.path} exists and is not an event log")
+            return open(self.path, "ab")
+        f = open(self.path, "wb")
+        header = json.dumps({
+            "dtype": EVENT_DTYPE.descr,
+            "types": {t.name: int(t) for t in EventType},
+            "death_causes": DEATH_CAUSES,
+            "species": SPECIES,
+        }).encode()
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        return f
+
+    def close(self):
+        if self.path is not None:
+            self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def recent(self):
+        """Events still held in memory, oldest first"""
+        if self._wrapped:
+            return np.concatenate([self.buffer[self.size:], self.buffer[:self.size]])
+        return self.buffer[:self.size].copy()
+
+
+def read_events(path):
+    """Memory-map an event log written by EventLog as a structured array"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an event log")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len))
+    dtype = np.dtype([tuple(field) for field in header["dtype"]])
+    offset = len(MAGIC) + 4 + header_len
+    if os.path.getsize(path) == offset:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset)
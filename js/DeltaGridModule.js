@@ -0,0 +1,98 @@
+/**
+ * Browser side of delta_grid.DeltaGrid: keeps the agents it has been sent,
+ * applies each frame's changed rows and removals, and repaints at most
+ * max_fps times per second on animation frames.
+ */
+const DeltaGridModule = function (canvas_width, canvas_height, grid_width, grid_height, max_fps) {
+  const ROW = 6; // unique_id, x, y, style, label, value
+
+  const parent = document.createElement("div");
+  parent.style.height = `${canvas_height}px`;
+  parent.className = "world-grid-parent";
+  const createCanvas = () => {
+    const el = document.createElement("canvas");
+    el.width = canvas_width;
+    el.height = canvas_height;
+    el.className = "world-grid";
+    return el;
+  };
+  const canvas = createCanvas();
+  const interaction_canvas = createCanvas();
+  parent.appendChild(canvas);
+  parent.appendChild(interaction_canvas);
+  document.getElementById("elements").appendChild(parent);
+
+  const interactionHandler = new InteractionHandler(
+    canvas_width, canvas_height, grid_width, grid_height, interaction_canvas.getContext("2d")
+  );
+  const canvasDraw = new GridVisualization(
+    canvas_width, canvas_height, grid_width, grid_height, canvas.getContext("2d"), interactionHandler
+  );
+
+  const agents = new Map(); // unique_id -> row
+  let styles = [];
+  let labels = {};
+  let step = 0;
+  let paintPending = false;
+  let lastPaint = 0;
+
+  const decode = (packed) => {
+    const bytes = Uint8Array.from(atob(packed), (c) => c.charCodeAt(0));
+    return new Int32Array(bytes.buffer);
+  };
+
+  const portrayal = (row) => {
+    const style = styles[row[3]];
+    const label = row[4] >= 0 ? labels[row[4]] : "";
+    const age = step - row[5];
+    const p = Object.assign({}, style, { x: row[1], y: row[2] });
+    if (style.text) {
+      p.text = style.text.replace("{label}", label).replace("{value}", row[5]).replace("{age}", age);
+    }
+    if (style.age_color) {
+      const freshness = Math.max(0, (100 - age) / 100);
+      p.Color = `rgb(139, ${Math.trunc(255 * freshness)}, 69)`;
+    }
+    return p;
+  };
+
+  const paint = (now) => {
+    if (max_fps && now - lastPaint < 1000 / max_fps) {
+      requestAnimationFrame(paint);
+      return;
+    }
+    paintPending = false;
+    lastPaint = now;
+    const layers = {};
+    for (const row of agents.values()) {
+      const p = portrayal(row);
+      (layers[p.Layer] ??= []).push(p);
+    }
+    canvasDraw.resetCanvas();
+    for (const layer of Object.keys(layers).sort((a, b) => a - b)) canvasDraw.drawLayer(layers[layer]);
+    canvasDraw.drawGridLines("#eee");
+  };
+
+  this.render = (frame) => {
+    if (frame.skip) return;
+    if (frame.full) {
+      agents.clear();
+      styles = frame.styles;
+      labels = {};
+    }
+    Object.assign(labels, frame.labels);
+    step = frame.step;
+    for (const unique_id of decode(frame.removed)) agents.delete(unique_id);
+    const rows = decode(frame.rows);
+    for (let i = 0; i < rows.length; i += ROW) agents.set(rows[i], rows.subarray(i, i + ROW));
+    if (!paintPending) {
+      paintPending = true;
+      requestAnimationFrame(paint);
+    }
+  };
+
+  this.reset = () => {
+    agents.clear();
+    canvasDraw.resetCanvas();
+  };
+};
@@ -0,0 +1,42 @@
+/**
+ * Controls for live.LiveModel: pause/resume, step N and a steps/second limit,
+ * sent to the server's /live/control endpoint, plus the worker's status.
+ */
+const LiveControls = function () {
+  const parent = document.createElement("div");
+  parent.className = "live-controls";
+  parent.innerHTML = `
+    <button type="button" class="btn btn-secondary btn-sm" data-action="toggle">Pause</button>
+    <input type="number" min="1" value="10" style="width:5em">
+    <button type="button" class="btn btn-secondary btn-sm" data-action="step">Step N</button>
+    <label>Steps/s (0 = max) <input type="number" min="0" value="0" style="width:6em"></label>
+    <span class="live-status"></span>`;
+  document.getElementById("elements").appendChild(parent);
+
+  const [toggle, stepButton] = parent.querySelectorAll("button");
+  const [countInput, speedInput] = parent.querySelectorAll("input");
+  const status = parent.querySelector(".live-status");
+  let paused = false;
+
+  const control = (action, value) =>
+    fetch("/live/control", { method: "POST", body: JSON.stringify({ action, value }) })
+      .then((response) => response.json())
+      .then((state) => {
+        paused = state.paused;
+        toggle.innerText = paused ? "Resume" : "Pause";
+      });
+
+  toggle.onclick = () => control(paused ? "resume" : "pause");
+  stepButton.onclick = () => control("step", Number(countInput.value));
+  speedInput.onchange = () => control("speed", Number(speedInput.value));
+
+  this.render = (data) => {
+    paused = data.paused;
+    toggle.innerText = paused ? "Resume" : "Pause";
+    status.innerText = ` Step ${data.step} · ${data.rate} steps/s${paused ? " · paused" : ""}`;
+  };
+
+  this.reset = () => {
+    status.innerText = "";
+  };
+};
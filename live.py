@@ -0,0 +1,220 @@
+"""
+Run a model in a background thread and visualize published snapshots.
+
+LiveModel stands in for the model class in a ModularServer. It steps the real
+model on a worker thread, as fast as allowed by steps_per_second, and publishes
+an immutable Snapshot every publish_interval seconds. The server renders the
+newest snapshot, so the browser frame rate no longer limits the simulation.
+Pause, step-N and speed are controlled from the LiveControls element.
+
+    python run.py --live
+"""
+import copy
+import os
+import threading
+import time
+
+import tornado.escape
+import tornado.web
+from mesa.visualization.ModularVisualization import ModularServer, VisualizationElement
+
+import checkpoint
+from events import QUIET
+from model import PetModel
+from telemetry import TelemetryHub, telemetry_handlers
+
+COUNT_FIELDS = ("dog_count", "cat_count", "food_count", "feeder_count", "business_agents_active")
+
+
+class Snapshot:
+    """
+    Read-only copy of a model between two steps: its statistics, counts and a
+    shallow copy of every live agent, whose .model is the snapshot itself.
+    """
+    def __init__(self, model):
+        for field in checkpoint.MODEL_FIELDS + COUNT_FIELDS:
+            setattr(self, field, getattr(model, field))
+        self.deaths_by_cause = dict(model.deaths_by_cause)
+        self.live_agents = {}
+        for cls, agents in model.live_agents.items():
+            views = {}
+            for unique_id, agent in agents.items():
+                view = copy.copy(agent)
+                view.model = self
+                views[unique_id] = view
+            self.live_agents[cls] = views
+        self.created = time.monotonic()
+
+
+class LiveModel:
+    """
+    Owns a model_cls instance stepped by a background thread. Attribute reads
+    that LiveModel does not define go to the current snapshot.
+    """
+    description = "Runs the pet ecosystem in the background and shows its latest state."
+
+    def __init__(self, model_cls=PetModel, steps_per_second=None, publish_interval=0.05, **model_params):
+        # The thread steps at full speed, so the periodic console summaries stay off
+        model_params.setdefault("verbosity", QUIET)
+        self.model = model_cls(**model_params)
+        self.steps_per_second = steps_per_second
+        self.publish_interval = publish_interval
+        self.paused = False
+        self.steps_requested = 0
+        self.measured_rate = 0.0
+        self.snapshot = Snapshot(self.model)
+        self._pinned = None
+        self._started = False
+        self._stopping = False
+        self._wake = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="live-model", daemon=True)
+
+    def __getattr__(self, name):
+        # Only reached for names LiveModel does not have itself
+        if name.startswith("_") or name == "snapshot":
+            raise AttributeError(name)
+        return getattr(self._pinned or self.snapshot, name)
+
+    @property
+    def running(self):
+        return (self._pinned or self.snapshot).running
+
+    @running.setter
+    def running(self, value):
+        self.model.running = value
+
+    def pinned(self):
+        """Context manager holding one snapshot in place, so a render sees a consistent state"""
+        return _Pin(self)
+
+    def step(self):
+        """Called by the server for every frame; the first call starts the worker"""
+        if not self._started:
+            self._started = True
+            self._thread.start()
+
+    def pause(self):
+        with self._wake:
+            self.paused = True
+            self.steps_requested = 0
+
+    def resume(self):
+        with self._wake:
+            self.paused = False
+            self._wake.notify()
+
+    def step_n(self, n):
+        """Advance exactly n steps, then pause"""
+        with self._wake:
+            self.paused = True
+            self.steps_requested += n
+            self._wake.notify()
+        self.step()
+
+    def set_speed(self, steps_per_second):
+        """Limit the stepping rate; None or 0 runs at full speed"""
+        self.steps_per_second = steps_per_second or None
+
+    def stop(self):
+        with self._wake:
+            self._stopping = True
+            self._wake.notify()
+        if self._started:
+            self._thread.join()
+
+    def _run(self):
+        model = self.model
+        last_publish = time.monotonic()
+        rate_start, rate_steps = last_publish, 0
+        while True:
+            with self._wake:
+                while not self._stopping and self.paused and not self.steps_requested:
+                    self._wake.wait()
+                if self._stopping:
+                    return
+                single = self.paused
+                if single:
+                    self.steps_requested -= 1
+
+            started = time.monotonic()
+            model.step()
+            rate_steps += 1
+            now = time.monotonic()
+            if now - rate_start >= 1.0:
+                self.measured_rate = rate_steps / (now - rate_start)
+                rate_start, rate_steps = now, 0
+
+            finished = not model.running
+            if finished:
+                self.pause()
+            if finished or (single and not self.steps_requested) or now - last_publish >= self.publish_interval:
+                self.snapshot = Snapshot(model)
+                last_publish = now
+            if self.steps_per_second:
+                time.sleep(max(0.0, 1.0 / self.steps_per_second - (time.monotonic() - started)))
+
+
+class _Pin:
+    def __init__(self, live):
+        self.live = live
+
+    def __enter__(self):
+        self.live._pinned = self.live.snapshot
+        return self.live._pinned
+
+    def __exit__(self, *exc):
+        self.live._pinned = None
+
+
+class LiveControls(VisualizationElement):
+    """Pause/resume, step-N and speed controls for a LiveModel"""
+    local_includes = ["LiveControls.js"]
+    local_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js")
+    js_code = "elements.push(new LiveControls());"
+
+    def render(self, model):
+        return {"step": model.step_count, "paused": model.paused, "speed": model.steps_per_second or 0,
+                "rate": round(model.measured_rate, 1)}
+
+
+class LiveControlHandler(tornado.web.RequestHandler):
+    """POST {"action": "pause" | "resume" | "step" | "speed", "value": n} to /live/control"""
+    def post(self):
+        message = tornado.escape.json_decode(self.request.body)
+        live = self.application.model
+        action = message.get("action")
+        if action == "pause":
+            live.pause()
+        elif action == "resume":
+            live.step()
+            live.resume()
+        elif action == "step":
+            live.step_n(max(1, int(message.get("value", 1))))
+        elif action == "speed":
+            live.set_speed(float(message.get("value") or 0))
+        else:
+            raise tornado.web.HTTPError(400, f"unknown action {action!r}")
+        self.write({"paused": live.paused, "speed": live.steps_per_second or 0})
+
+
+class LiveServer(ModularServer):
+    """
+    ModularServer for a LiveModel: renders pinned snapshots and serves
+    /live/control, plus the telemetry streams of the current model
+    """
+    def __init__(self, *args, **kwargs):
+        # reset_model() attaches the hub from within ModularServer.__init__
+        self.telemetry = TelemetryHub()
+        super().__init__(*args, **kwargs)
+        self.add_handlers(r".*", [(r"/live/control", LiveControlHandler)] + telemetry_handlers(self.telemetry))
+
+    def reset_model(self):
+        previous = getattr(self, "model", None)
+        if previous is not None:
+            previous.stop()
+        super().reset_model()
+        self.telemetry.attach(self.model.model)
+
+    def render_model(self):
+        with self.model.pinned():
+            return super().render_model()
@@ -0,0 +1,102 @@
+"""
+Per-tick mate matching for PetModel(mate_search="batched").
+
+Instead of every mate seeker scanning radius 12 for the nearest ready
+partner, all ready pets of a species are matched once per tick: candidate
+pairs come from a spatial hash with cells at least radius + 1 wide, so only
+the 3x3 surrounding cells are checked, and pairs are accepted greedily from
+the closest up, each pet taking at most one partner. Both sides of a pair
+therefore head for each other. A pet left without a partner is pointed at its
+nearest candidate, as the exact search would.
+"""
+import numpy as np
+
+
+def candidate_pairs(xs, ys, radius, width, height, block=4096):
+    """
+    Index pairs (i < j) of points in each other's torus Moore neighbourhood
+    of `radius` (so never on the same cell), and their Chebyshev distance as
+    distance_to measures it (without wrapping). Points are processed `block`
+    at a time to bound the size of the intermediate arrays.
+    """
+    n = len(xs)
+    # At least radius + 1 cells per hash cell, so a window only spans neighbouring cells
+    cells_x = max(1, width // (radius + 1))
+    cells_y = max(1, height // (radius + 1))
+    cx = xs * cells_x // width
+    cy = ys * cells_y // height
+    keys = cx * cells_y + cy
+    order = np.argsort(keys, kind="stable")
+    starts = np.searchsorted(keys[order], np.arange(cells_x * cells_y))
+    ends = np.searchsorted(keys[order], np.arange(cells_x * cells_y), side="right")
+
+    found = []
+    for lo in range(0, n, block):
+        points = np.arange(lo, min(n, lo + block))
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                cell = (cx[points] + dx) % cells_x * cells_y + (cy[points] + dy) % cells_y
+                counts = ends[cell] - starts[cell]
+                total = int(counts.sum())
+                if not total:
+                    continue
+                i = np.repeat(points, counts)
+                first = np.repeat(starts[cell] - np.cumsum(counts) + counts, counts)
+                j = order[first + np.arange(total)]
+                # The neighbourhood excludes the pet's own cell, as get_neighbors does
+                keep = (i < j) & ((xs[i] != xs[j]) | (ys[i] != ys[j]))
+                if 2 * radius + 1 < width:
+                    keep &= (xs[j] - xs[i] + radius) % width <= 2 * radius
+                if 2 * radius + 1 < height:
+                    keep &= (ys[j] - ys[i] + radius) % height <= 2 * radius
+                found.append(i[keep] * n + j[keep])
+    # With few hash cells per axis the same cell can be visited more than once
+    pair = np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+    i, j = pair // n, pair % n
+    distance = np.maximum(np.abs(xs[j] - xs[i]), np.abs(ys[j] - ys[i]))
+    return i, j, distance
+
+
+def match_mates(pets, radius, width, height, candidates=6):
+    """
+    {unique_id: partner or None} for every pet in `pets`: its matched partner,
+    or its nearest candidate if all of them were taken, or None if it has none.
+    Only pairs among the `candidates` nearest of at least one side are
+    considered, which keeps crowded areas cheap.
+    """
+    plan = dict.fromkeys(pet.unique_id for pet in pets)
+    if len(pets) < 2:
+        return plan
+    xs = np.array([pet.pos[0] for pet in pets], dtype=np.int64)
+    ys = np.array([pet.pos[1] for pet in pets], dtype=np.int64)
+    uids = np.array([pet.unique_id for pet in pets], dtype=np.int64)
+    i, j, distance = candidate_pairs(xs, ys, radius, width, height)
+    low, high = np.minimum(uids[i], uids[j]), np.maximum(uids[i], uids[j])
+
+    # Rank every pair from both ends and keep those among the nearest of either pet
+    pet = np.concatenate([i, j])
+    pair = np.concatenate([np.arange(len(i))] * 2)
+    by_pet = np.lexsort((np.tile(high, 2), np.tile(low, 2), np.tile(distance, 2), pet))
+    group_start = np.searchsorted(pet[by_pet], pet[by_pet])
+    near = np.zeros(len(i), dtype=bool)
+    near[pair[by_pet][np.arange(len(by_pet)) - group_start < candidates]] = True
+    i, j, distance, low, high = i[near], j[near], distance[near], low[near], high[near]
+
+    # Closest pairs first, ties broken by the ids so the result does not depend on the order of pets
+    order = np.lexsort((high, low, distance))
+
+    matched = set()
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        first, second = pets[a], pets[b]
+        if a in matched or b in matched:
+            # Still the nearest candidate of a pet that has none yet
+            if plan[first.unique_id] is None:
+                plan[first.unique_id] = second
+            if plan[second.unique_id] is None:
+                plan[second.unique_id] = first
+            continue
+        matched.add(a)
+        matched.add(b)
+        plan[first.unique_id] = second
+        plan[second.unique_id] = first
+    return plan
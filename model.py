@@ -1,36 +1,105 @@
+import hashlib
+from array import array
 from mesa import Model
-from mesa.space import MultiGrid
-from mesa.time import RandomActivation
-from agents import DogAgent, CatAgent, FeederAgent, FoodMarker, BusinessAgent
+from mesa.agent import AgentSet
+from agents import DogAgent, CatAgent, FeederAgent, FoodMarker, BusinessAgent, MATE_RADIUS
+from spatial import IndexedMultiGrid, IndexedChunkedGrid
+from events import EventLog, EventType, SUMMARY
+from food_field import FoodField
+from mating import match_mates
+from scheduling import CompactRandomActivation, EventScheduler, FastForwardScheduler
+import checkpoint
+import profiling
+
+# Fast-forwarding stops once either population reaches this fraction of its harvest threshold
+COAST_HARVEST_MARGIN = 0.9
 
 class PetModel(Model):
-    def __init__(self, width=20, height=20, num_dogs=3, num_cats=3, num_feeders=1):
+    def __init__(self, width=20, height=20, num_dogs=3, num_cats=3, num_feeders=1,
+                 dog_harvest_threshold=30, cat_harvest_threshold=30, seed=None,
+                 verbosity=SUMMARY, event_log=None, fingerprint=False, world="dense", chunk_size=64,
+                 food_search="exact", scent_diffusion=0.0, mate_search="exact", scheduler="random",
+                 fast_forward=False):
+        # seed is picked up by Model.__new__ and drives self.random, which every
+        # agent draws from, so the same seed always gives the same run
         super().__init__()
         
-        self.grid = MultiGrid(width, height, torus=True)
-        self.schedule = RandomActivation(self)
+        # "chunked" stores only occupied cells, for maps too large for a dense grid
+        if world == "dense":
+            self.grid = IndexedMultiGrid(width, height, torus=True)
+        elif world == "chunked":
+            self.grid = IndexedChunkedGrid(width, height, torus=True, chunk_size=chunk_size)
+        else:
+            raise ValueError(f"unknown world {world!r}, expected 'dense' or 'chunked'")
+        self.world = world
+        self.chunk_size = chunk_size
+        # Per-class spatial index for nearest/within-radius lookups
+        self.spatial = self.grid.index
+        # "field" makes hungry pets climb a food scent map instead of searching radius 10
+        if food_search == "exact":
+            self.food_field = None
+        elif food_search == "field":
+            # The scent map is dense, width * height floats, which a chunked world exists to avoid
+            if world == "chunked":
+                raise ValueError("food_search='field' needs world='dense'")
+            self.food_field = FoodField(width, height, radius=10, diffusion=scent_diffusion)
+        else:
+            raise ValueError(f"unknown food_search {food_search!r}, expected 'exact' or 'field'")
+        self.food_search = food_search
+        self.scent_diffusion = scent_diffusion
+        # "batched" pairs up all ready pets once per tick instead of a radius-12 search per seeker
+        if mate_search not in ("exact", "batched"):
+            raise ValueError(f"unknown mate_search {mate_search!r}, expected 'exact' or 'batched'")
+        self.mate_search = mate_search
+        # unique_id -> planned partner (or None) for this tick, set by plan_mates
+        self.mate_plan = None
+        # "event" leaves food and cooling-down feeders out of the activation order
+        if scheduler == "random":
+            self.schedule = CompactRandomActivation(self)
+        elif scheduler == "event":
+            self.schedule = FastForwardScheduler(self) if fast_forward else EventScheduler(self)
+        else:
+            raise ValueError(f"unknown scheduler {scheduler!r}, expected 'random' or 'event'")
+        self.scheduler = scheduler
+        # Idle pets skip ahead several ticks at a time, sitting them out on the event scheduler
+        if fast_forward and scheduler != "event":
+            raise ValueError("fast_forward needs scheduler='event'")
+        self.fast_forward = fast_forward
+        # Whether pets may fast-forward this tick, set by update_coasting
+        self.coasting = False
         self.running = True
         self.next_agent_id = 0
+        # Typed event bus; event_log is an optional file the events are flushed to,
+        # on close() at the latest, and appended to if it already holds a log
+        self.events = EventLog(self, verbosity=verbosity, path=event_log)
 
-        # Attributes to hold current population counts
-        self.dog_count = 0
-        self.cat_count = 0
-        self.food_count = 0
-        self.feeder_count = 0
-        self.business_agents_active = 0
+        # Live agents by type (unique_id -> agent), kept current by add_agent/remove_agent
+        self.live_agents = {cls: {} for cls in (DogAgent, CatAgent, FoodMarker, FeederAgent, BusinessAgent)}
         
         # Business thresholds - changed to 30 for both species
-        self.dog_harvest_threshold = 30
-        self.cat_harvest_threshold = 30
+        self.dog_harvest_threshold = dog_harvest_threshold
+        self.cat_harvest_threshold = cat_harvest_threshold
         self.max_business_agents = 2
         
         # Track statistics
         self.step_count = 0
         self.total_births = 0
         self.total_deaths = 0
+        self.deaths_by_cause = {"starvation": 0, "old_age": 0, "illness": 0}
         self.total_harvested = 0
         self.total_money_made = 0
 
+        # Chained hash of the state after every step; equal fingerprints mean identical runs
+        self.fingerprint = hashlib.blake2b(digest_size=16).hexdigest() if fingerprint else None
+        # Set by enable_profiling; nothing is instrumented while this is None
+        self.profiler = None
+        # Callables run with the model at the end of every step, e.g. a recorder.Recorder
+        self.observers = []
+        # Removed FoodMarkers wait a step in _spent_food, in case anything still
+        # refers to them, before new_food may hand them out again
+        self._spent_food = []
+        self._food_pool = []
+
         # Create dogs
         for _ in range(num_dogs):
             dog = DogAgent(self.next_agent_id, self)
@@ -49,6 +118,147 @@ class PetModel(Model):
             self.place_agent_on_empty(feeder)
             self.next_agent_id += 1
 
+    # Current population counts
+    @property
+    def dog_count(self):
+        return len(self.live_agents[DogAgent])
+
+    @property
+    def cat_count(self):
+        return len(self.live_agents[CatAgent])
+
+    @property
+    def food_count(self):
+        return len(self.live_agents[FoodMarker])
+
+    @property
+    def feeder_count(self):
+        return len(self.live_agents[FeederAgent])
+
+    @property
+    def business_agents_active(self):
+        return len(self.live_agents[BusinessAgent])
+
+    def close(self):
+        """Write any buffered events to the event log file and close it; runs also do this when all pets die"""
+        self.events.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def save_checkpoint(self, path):
+        """Write the full model state (grid, agents, statistics, RNG) to a checkpoint file"""
+        checkpoint.save_checkpoint(self, path)
+
+    @classmethod
+    def load_checkpoint(cls, path, **kwargs):
+        """Restore a model saved with save_checkpoint; kwargs such as verbosity go to the constructor"""
+        return checkpoint.load_checkpoint(path, cls, **kwargs)
+
+    def enable_profiling(self, sample_every=1):
+        """Record call counts, wall time and query sizes on every sample_every-th tick; returns the Profiler"""
+        self.disable_profiling()
+        self.profiler = profiling.Profiler(self, sample_every)
+        self.profiler.attach()
+        return self.profiler
+
+    def disable_profiling(self):
+        """Stop profiling and return the Profiler with what it recorded, if there was one"""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.detach()
+            self.profiler = None
+        return profiler
+
+    # live_agents already holds every agent, so Mesa's registry (a dict plus two
+    # weak AgentSets, each with an entry per agent) is not kept; Model.agents and
+    # agents_by_type are built from live_agents when asked for
+    def register_agent(self, agent):
+        pass
+
+    def deregister_agent(self, agent):
+        pass
+
+    @property
+    def agents(self):
+        return AgentSet([agent for agents in self.live_agents.values() for agent in agents.values()], self)
+
+    @property
+    def agent_types(self):
+        return [cls for cls, agents in self.live_agents.items() if agents]
+
+    @property
+    def agents_by_type(self):
+        return {cls: AgentSet(agents.values(), self) for cls, agents in self.live_agents.items() if agents}
+
+    def find_agent(self, unique_id):
+        """Live agent with the given id, or None"""
+        for agents in self.live_agents.values():
+            if unique_id in agents:
+                return agents[unique_id]
+        return None
+
+    def add_agent(self, agent, pos):
+        """Put a new agent on the grid and in the schedule, and register it as live"""
+        self.grid.place_agent(agent, pos)
+        if self.scheduler == "event" and type(agent) is FoodMarker:
+            # Food has nothing to do until it expires
+            self.schedule.at(agent.born + agent.expiration_time, agent, "expire")
+        else:
+            self.schedule.add(agent)
+        self.live_agents[type(agent)][agent.unique_id] = agent
+        if self.food_field is not None and type(agent) is FoodMarker:
+            self.food_field.add(pos)
+
+    def remove_agent(self, agent):
+        """Take an agent off the grid and out of the schedule for good"""
+        if self.food_field is not None and type(agent) is FoodMarker:
+            self.food_field.remove(agent.pos)
+        self.grid.remove_agent(agent)
+        self.schedule.remove(agent)
+        del self.live_agents[type(agent)][agent.unique_id]
+        if type(agent) is FoodMarker:
+            self._spent_food.append(agent)
+
+    def suspend(self, agent, ticks):
+        """
+        Leave agent out of the next `ticks` activations if the scheduler can;
+        returns False when every agent is activated every tick anyway
+        """
+        if self.scheduler != "event":
+            return False
+        self.schedule.suspend(agent, ticks)
+        return True
+
+    def new_food(self, unique_id):
+        """A FoodMarker with the given id, recycled from food removed in an earlier step when possible"""
+        if self._food_pool:
+            food = self._food_pool.pop()
+            food.__init__(unique_id, self)
+            return food
+        return FoodMarker(unique_id, self)
+
+    def plan_mates(self):
+        """Match partners among all pets ready to mate, per species, for the coming tick"""
+        plan = {}
+        for cls in (DogAgent, CatAgent):
+            ready = [pet for pet in self.live_agents[cls].values() if pet.is_ready_partner()]
+            plan.update(match_mates(ready, MATE_RADIUS, self.grid.width, self.grid.height))
+        self.mate_plan = plan
+
+    def update_coasting(self):
+        """
+        Allow fast-forwarding only while no business agent is hunting and no
+        harvest threshold is close: both act on pet positions, which are
+        approximate for pets sitting out skipped ticks
+        """
+        self.coasting = (self.business_agents_active == 0
+                         and self.dog_count < COAST_HARVEST_MARGIN * self.dog_harvest_threshold
+                         and self.cat_count < COAST_HARVEST_MARGIN * self.cat_harvest_threshold)
+
     def place_agent_on_empty(self, agent):
         """Place agent on an empty cell or find the least crowded cell"""
         max_attempts = 100
@@ -60,58 +270,34 @@ class PetModel(Model):
             
             # Check if cell is empty
             if self.grid.is_cell_empty((x, y)):
-                self.grid.place_agent(agent, (x, y))
-                self.schedule.add(agent)
+                self.add_agent(agent, (x, y))
                 return
             
             attempts += 1
         
-        # If no empty cell found, place on least crowded cell
-        min_agents = float('inf')
-        best_pos = None
-        
-        for x in range(self.grid.width):
-            for y in range(self.grid.height):
-                cell_contents = self.grid.get_cell_list_contents([(x, y)])
-                if len(cell_contents) < min_agents:
-                    min_agents = len(cell_contents)
-                    best_pos = (x, y)
-        
-        if best_pos:
-            self.grid.place_agent(agent, best_pos)
-            self.schedule.add(agent)
+        # If no empty cell found, place on least crowded cell (first one in x-major order)
+        self.add_agent(agent, self.grid.occupancy.least_crowded())
 
     def step(self):
         self.step_count += 1
         
-        # Store previous counts to track births/deaths
-        prev_dog_count = self.dog_count
-        prev_cat_count = self.cat_count
-        
-        # Run agent steps
+        if self.mate_search == "batched":
+            self.plan_mates()
+        if self.fast_forward:
+            self.update_coasting()
+        # Run agent steps; births, deaths and captures are counted as they happen
         self.schedule.step()
-        
-        # Recalculate counts each step
-        self.dog_count = sum(1 for a in self.schedule.agents if isinstance(a, DogAgent))
-        self.cat_count = sum(1 for a in self.schedule.agents if isinstance(a, CatAgent))
-        self.food_count = sum(1 for a in self.schedule.agents if isinstance(a, FoodMarker))
-        self.feeder_count = sum(1 for a in self.schedule.agents if isinstance(a, FeederAgent))
-        self.business_agents_active = sum(1 for a in self.schedule.agents if isinstance(a, BusinessAgent))
+        if self.food_field is not None:
+            self.food_field.step()
         
         # Check if we need to spawn business agents
         self.check_business_intervention()
-        
-        # Track births and deaths
-        dog_births = max(0, self.dog_count - prev_dog_count)
-        cat_births = max(0, self.cat_count - prev_cat_count)
-        self.total_births += dog_births + cat_births
-        
-        dog_deaths = max(0, prev_dog_count - self.dog_count)
-        cat_deaths = max(0, prev_cat_count - self.cat_count)
-        self.total_deaths += dog_deaths + cat_deaths
+
+        if self.fingerprint is not None:
+            self.update_fingerprint()
         
         # Optional: Print statistics every 50 steps
-        if self.step_count % 50 == 0:
+        if self.step_count % 50 == 0 and self.events.verbosity >= SUMMARY:
             print(f"Step {self.step_count}: Dogs={self.dog_count}, Cats={self.cat_count}, "
                   f"Food={self.food_count}, Business=${self.business_agents_active}")
             print(f"  Births={self.total_births}, Deaths={self.total_deaths}, "
@@ -119,8 +305,27 @@ class PetModel(Model):
         
         # Stop simulation if all pets die
         if self.dog_count == 0 and self.cat_count == 0:
-            print(f"All pets died at step {self.step_count}")
+            if self.events.verbosity >= SUMMARY:
+                print(f"All pets died at step {self.step_count}")
             self.running = False
+            self.close()
+
+        for observer in self.observers:
+            observer(self)
+        self._food_pool.extend(self._spent_food)
+        self._spent_food.clear()
+
+    def update_fingerprint(self):
+        """Fold the current agents, statistics and RNG state into the run fingerprint"""
+        digest = hashlib.blake2b(bytes.fromhex(self.fingerprint), digest_size=16)
+        digest.update(array("Q", self.random.getstate()[1]).tobytes())
+        stats = (self.step_count, self.next_agent_id, self.total_births, self.total_deaths,
+                 self.total_harvested, self.total_money_made)
+        agents = [(cls.__name__, uid, agent.pos, [getattr(agent, field) for field in fields])
+                  for cls, fields in checkpoint.AGENT_FIELDS.items()
+                  for uid, agent in sorted(self.live_agents[cls].items())]
+        digest.update(repr((stats, agents)).encode())
+        self.fingerprint = digest.hexdigest()
 
     def check_business_intervention(self):
         """Spawn targeted business agents when populations get too high"""
@@ -129,23 +334,23 @@ class PetModel(Model):
             
         spawn_business = False
         target_species = None
-        reason = ""
+        population = 0
         
         # Check if dogs need harvesting
         if self.dog_count >= self.dog_harvest_threshold:
             spawn_business = True
             target_species = 'dog'
-            reason = f"dog overpopulation ({self.dog_count})"
+            population = self.dog_count
         # Check if cats need harvesting (only if dogs don't need it)
         elif self.cat_count >= self.cat_harvest_threshold:
             spawn_business = True
             target_species = 'cat'
-            reason = f"cat overpopulation ({self.cat_count})"
+            population = self.cat_count
         
         if spawn_business:
             # Create business agent that targets specific species
             business_agent = BusinessAgent(self.next_agent_id, self, target_species=target_species)
             self.place_agent_on_empty(business_agent)
             self.next_agent_id += 1
-            self.business_agents_active += 1
-            print(f"🏢 BusinessAgent {business_agent.unique_id} enters to harvest {target_species}s due to {reason}!")
\ No newline at end of file
+            self.events.emit(EventType.BUSINESS_SPAWN, business_agent.unique_id, value=population,
+                             species=target_species)
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Band-partitioned parallel stepping for ArrayPetModel.
+
+The torus is cut into vertical bands of columns. Every tick the pet columns
+and the food grid are copied into one shared memory block, and each band's
+movement phase (plan_moves: state machine, resting, mate and food gradients,
+the move itself) runs in a worker process that reads only its band plus HALO
+columns on either side. The parent merges the plans and resolves everything
+that couples bands: contested food (one eater per cell), mate pairing across
+band borders, vitals, births and feeders.
+
+Random draws come from a counter-based generator keyed on (seed, tick, pet
+uid, stream) rather than a shared sequential stream, so a run is identical for
+any number of bands or workers, including one in-process band. The streams
+differ from the serial ArrayPetModel, whose runs it matches statistically.
+"""
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from array_model import ArrayPetModel, plan_moves, DOG, CAT, MAX_AGE_RANGE
+
+# Streams beyond those of array_model (TIRED .. REPRO)
+DIRECTION, MAX_AGE = 6, 7
+
+# Columns plan_moves reads, with their dtypes
+PLAN_COLUMNS = {"uid": np.int64, "species": np.int8, "x": np.int32, "y": np.int32, "age": np.int32,
+                "hunger": np.int16, "energy": np.int16, "sleepiness": np.int16, "health": np.int16,
+                "reproduction_cooldown": np.int16}
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def _mix_int(z):
+    """splitmix64 finaliser on a Python int"""
+    z &= _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def hash_bits(key, tick, uids, stream):
+    """64 random bits per uid, a pure function of (key, tick, uid, stream)"""
+    base = np.uint64(_mix_int(key ^ _mix_int(tick * _GOLDEN + stream)))
+    z = np.asarray(uids, dtype=np.int64).astype(np.uint64) * np.uint64(_GOLDEN) ^ base
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def hash_uniform(key, tick, uids, stream):
+    return (hash_bits(key, tick, uids, stream) >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+def hash_directions(key, tick, uids):
+    """Indices into MOORE_OFFSETS"""
+    return (hash_bits(key, tick, uids, DIRECTION) >> np.uint64(61)).astype(np.int64)
+
+
+class SharedPets:
+    """Pet columns (up to `capacity` rows) and the food grid in one shared memory block"""
+    def __init__(self, capacity, width, height, name=None):
+        self.capacity = capacity
+        self.shape = (width, height)
+        self.offsets = {}
+        size = 0
+        for column, dtype in PLAN_COLUMNS.items():
+            size = -(-size // 8) * 8
+            self.offsets[column] = size
+            size += capacity * np.dtype(dtype).itemsize
+        size = -(-size // 8) * 8
+        self.offsets["food_age"] = size
+        size += width * height * 2
+        if name is None:
+            self.block = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.block = shared_memory.SharedMemory(name=name)
+
+    @property
+    def layout(self):
+        """What a worker needs to attach: (name, capacity, width, height)"""
+        return (self.block.name, self.capacity) + self.shape
+
+    def views(self, n):
+        pets = {column: np.ndarray(n, dtype=dtype, buffer=self.block.buf, offset=self.offsets[column])
+                for column, dtype in PLAN_COLUMNS.items()}
+        food_age = np.ndarray(self.shape, dtype=np.int16, buffer=self.block.buf, offset=self.offsets["food_age"])
+        return pets, food_age
+
+    def close(self, unlink=False):
+        self.block.close()
+        if unlink:
+            self.block.unlink()
+
+
+# Worker side: the block this process is attached to
+_attached = None
+
+
+def _plan_band(task):
+    global _attached
+    layout, n, x_lo, x_hi, key, tick = task
+    if _attached is None or _attached.layout != layout:
+        if _attached is not None:
+            _attached.close()
+        name, capacity, width, height = layout
+        _attached = SharedPets(capacity, width, height, name=name)
+    pets, food_age = _attached.views(n)
+    return plan_moves(pets, food_age, x_lo, x_hi, lambda uids: hash_directions(key, tick, uids))
+
+
+class ParallelArrayPetModel(ArrayPetModel):
+    """
+    ArrayPetModel whose movement phase runs band by band on a process pool.
+    workers=0 or 1 plans the bands in-process; bands defaults to the number
+    of workers. Call close() (or use it as a context manager) to stop the pool.
+    """
+    def __init__(self, width=20, height=20, num_dogs=3, num_cats=3, num_feeders=1, seed=None,
+                 fingerprint=False, workers=None, bands=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.bands = bands or max(1, self.workers)
+        # Model.__new__ has already seeded self.random; the key is needed for the first pets
+        self.key = self.random.getrandbits(64)
+        self._pool = None
+        self._shared = None
+        super().__init__(width, height, num_dogs, num_cats, num_feeders, seed=seed, fingerprint=fingerprint)
+
+    def _plan_moves(self):
+        edges = np.linspace(0, self.width, min(self.bands, self.width) + 1).astype(int)
+        bands = list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+        key, tick = self.key, self.step_count
+        if self.workers <= 1:
+            plans = [plan_moves(self.pets, self.food_age, x_lo, x_hi, lambda uids: hash_directions(key, tick, uids))
+                     for x_lo, x_hi in bands]
+        else:
+            n = self._share()
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers)
+            plans = self._pool.map(_plan_band, [(self._shared.layout, n, x_lo, x_hi, key, tick)
+                                                for x_lo, x_hi in bands])
+        rows = np.concatenate([rows for rows, _ in plans])
+        return rows, {name: np.concatenate([plan[name] for _, plan in plans]) for name in plans[0][1]}
+
+    def _share(self):
+        """Copy the pet columns and food grid into shared memory; returns the row count"""
+        n = len(self.pets["uid"])
+        if self._shared is None or n > self._shared.capacity:
+            if self._shared is not None:
+                self._shared.close(unlink=True)
+            self._shared = SharedPets(max(1024, 2 * n), self.width, self.height)
+        pets, food_age = self._shared.views(n)
+        for column in PLAN_COLUMNS:
+            pets[column][:] = self.pets[column]
+        food_age[:] = self.food_age
+        return n
+
+    def _random(self, stream, uids):
+        return hash_uniform(self.key, self.step_count, uids, stream)
+
+    def _directions(self, uids):
+        return hash_directions(self.key, self.step_count, uids)
+
+    def _permutation(self, stream, rows):
+        order = np.argsort(hash_bits(self.key, self.step_count, self.pets["uid"][rows], stream), kind="stable")
+        return rows[order]
+
+    def _max_ages(self, species, uids):
+        # Keyed on the uid alone, which is never reused
+        bits = hash_bits(self.key, 0, uids, MAX_AGE)
+        low = np.where(species == DOG, MAX_AGE_RANGE[DOG][0], MAX_AGE_RANGE[CAT][0])
+        span = np.where(species == DOG, MAX_AGE_RANGE[DOG][1], MAX_AGE_RANGE[CAT][1]) - low + 1
+        return low + (bits % span.astype(np.uint64)).astype(np.int64)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._shared is not None:
+            self._shared.close(unlink=True)
+            self._shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,183 @@
+"""
+Opt-in per-tick instrumentation for PetModel.
+
+A Profiler wraps model.step. On sampled ticks it patches timers around the
+agent behaviours and the spatial queries, runs the tick, and restores the
+originals, so unsampled ticks and disabled models run the plain code. Timers
+keep a call stack, giving per-tick call counts and wall times, neighbour
+query sizes per calling behaviour, and folded stacks for flamegraph tools
+(flamegraph.pl, speedscope, inferno).
+
+    profiler = model.enable_profiling(sample_every=10)
+    ...
+    profiler.write_folded("pets.folded")
+
+Methods are patched on the classes, so only one model per process should be
+profiled at a time.
+"""
+import json
+import time
+from collections import defaultdict
+
+from agents import PetAgent, DogAgent, CatAgent, FeederAgent, BusinessAgent, FoodMarker
+from spatial import SpatialIndex
+
+# Behaviours timed on every class that defines them
+PROFILED_CLASSES = (PetAgent, DogAgent, CatAgent, FeederAgent, BusinessAgent, FoodMarker)
+PROFILED_METHODS = ("step", "update_vitals_and_age", "seek_food", "seek_mate", "eat", "try_reproduce_with",
+                    "random_move", "move_towards", "follow_food_scent", "coast", "die", "patrol", "drop_food",
+                    "hunt_target_animals", "attempt_capture", "leave_ecosystem")
+
+# Marks a patched attribute that did not exist before, so uninstalling deletes it
+_MISSING = object()
+
+# Spatial queries whose result sizes are recorded against the behaviour that made them
+QUERY_METHODS = ("within_radius", "nearest_first", "nearest")
+
+
+class Profiler:
+    """
+    Per-tick profile of one model. `ticks` holds one record per sampled tick:
+    {"tick", "seconds", "methods": {label: [calls, seconds]},
+    "queries": {label: [calls, results, max_results]}}. Method seconds are
+    inclusive; folded stacks hold exclusive time in microseconds.
+    """
+    def __init__(self, model, sample_every=1):
+        self.model = model
+        self.sample_every = sample_every
+        self.ticks = []
+        self.folded = defaultdict(float)
+        self._stack = []
+        self._child_seconds = []
+        self._scanned = 0
+        self._patches = []
+        self._model_step = None
+
+    def attach(self):
+        self._model_step = self.model.step
+        # An instance attribute shadows PetModel.step for this model only
+        self.model.step = self._step
+
+    def detach(self):
+        if self._model_step is not None:
+            del self.model.step
+            self._model_step = None
+
+    def _step(self):
+        tick = self.model.step_count + 1
+        if tick % self.sample_every:
+            return self._model_step()
+        self._methods = defaultdict(lambda: [0, 0.0])
+        self._queries = defaultdict(lambda: [0, 0, 0])
+        self._install()
+        start = time.perf_counter()
+        try:
+            self._frame(f"{type(self.model).__name__}.step", self._model_step)
+        finally:
+            seconds = time.perf_counter() - start
+            self._uninstall()
+        self.ticks.append({"tick": tick, "seconds": seconds,
+                           "methods": dict(self._methods), "queries": dict(self._queries)})
+
+    def _frame(self, label, func, *args, **kwargs):
+        """Call func as a profiled frame called label"""
+        self._stack.append(label)
+        self._child_seconds.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self_seconds = elapsed - self._child_seconds.pop()
+            self.folded[";".join(self._stack)] += self_seconds * 1e6
+            self._stack.pop()
+            if self._child_seconds:
+                self._child_seconds[-1] += elapsed
+            stats = self._methods[label]
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def _install(self):
+        model = self.model
+        self._patch(model.schedule, "step", self._timed("schedule.step", model.schedule.step))
+        self._patch(model, "check_business_intervention",
+                    self._timed(f"{type(model).__name__}.check_business_intervention",
+                                model.check_business_intervention))
+        for cls in PROFILED_CLASSES:
+            for name in PROFILED_METHODS:
+                if name in cls.__dict__:
+                    self._patch(cls, name, self._timed(f"{cls.__name__}.{name}", cls.__dict__[name]))
+        for name in QUERY_METHODS:
+            self._patch(SpatialIndex, name, self._query(f"SpatialIndex.{name}", SpatialIndex.__dict__[name]))
+        self._patch(SpatialIndex, "_candidates", self._counted(SpatialIndex.__dict__["_candidates"]))
+
+    def _patch(self, owner, name, replacement):
+        # Whatever owner itself held under name (such as the step wrapper mesa
+        # sets on each scheduler) is put back; attributes it lacked are deleted
+        self._patches.append((owner, name, owner.__dict__.get(name, _MISSING)))
+        setattr(owner, name, replacement)
+
+    def _uninstall(self):
+        for owner, name, original in reversed(self._patches):
+            if original is _MISSING:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self._patches = []
+
+    def _timed(self, label, func):
+        frame = self._frame
+
+        def timed(*args, **kwargs):
+            return frame(label, func, *args, **kwargs)
+        return timed
+
+    def _query(self, label, func):
+        profiler = self
+
+        def query(*args, **kwargs):
+            caller = profiler._stack[-1]
+            scanned = profiler._scanned
+            result = profiler._frame(label, func, *args, **kwargs)
+            # within_radius returns every match; nearest reports how many candidates it scanned
+            size = len(result) if isinstance(result, list) else profiler._scanned - scanned
+            stats = profiler._queries[f"{caller}>{label}"]
+            stats[0] += 1
+            stats[1] += size
+            stats[2] = max(stats[2], size)
+            return result
+        return query
+
+    def _counted(self, generator):
+        profiler = self
+
+        def counted(*args, **kwargs):
+            for item in generator(*args, **kwargs):
+                profiler._scanned += 1
+                yield item
+        return counted
+
+    def totals(self):
+        """Method and query statistics summed over all sampled ticks"""
+        methods = defaultdict(lambda: [0, 0.0])
+        queries = defaultdict(lambda: [0, 0, 0])
+        for record in self.ticks:
+            for label, (calls, seconds) in record["methods"].items():
+                methods[label][0] += calls
+                methods[label][1] += seconds
+            for label, (calls, size, largest) in record["queries"].items():
+                queries[label][0] += calls
+                queries[label][1] += size
+                queries[label][2] = max(queries[label][2], largest)
+        return {"ticks": len(self.ticks), "methods": dict(methods), "queries": dict(queries)}
+
+    def write_folded(self, path):
+        """Folded stacks ("frame;frame;frame microseconds"), the input format of flamegraph.pl"""
+        with open(path, "w") as f:
+            for stack, micros in sorted(self.folded.items()):
+                if round(micros):
+                    f.write(f"{stack} {round(micros)}\n")
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump({"sample_every": self.sample_every, "ticks": self.ticks}, f)
@@ -0,0 +1,171 @@
+"""
+Per-step history of a PetModel, streamed to disk in columnar form.
+
+A Recorder attached to a model appends one row of model metrics every step
+and, every agent_every steps, one row per pet (or per sampled pet). Rows go
+into preallocated column chunks that are handed to a ColumnWriter whenever
+they fill up, so memory stays at one chunk per table however long the run.
+
+    recorder = Recorder(model, "history/", agent_every=10, agent_sample=500)
+    for _ in range(steps):
+        model.step()
+    recorder.close()
+    history = read_recording("history/")
+
+The output directory holds two columnar stores, model/ and agents/, plus
+states.json with the names behind the agents' state codes.
+"""
+import json
+import os
+
+import numpy as np
+
+from agents import DogAgent, CatAgent
+from columnar import ColumnWriter, read_columns
+
+MODEL_COLUMNS = {"step": np.int64, "dog_count": np.int32, "cat_count": np.int32, "food_count": np.int32,
+                 "feeder_count": np.int32, "business_agents_active": np.int32, "total_births": np.int64,
+                 "total_deaths": np.int64, "starvation": np.int64, "old_age": np.int64, "illness": np.int64,
+                 "total_harvested": np.int64, "total_money_made": np.int64}
+
+# Read straight off the model; step and the death causes are filled in separately
+MODEL_METRICS = ("dog_count", "cat_count", "food_count", "feeder_count", "business_agents_active", "total_births",
+                 "total_deaths", "total_harvested", "total_money_made")
+
+# energy is -1 for cats and sleepiness -1 for dogs
+AGENT_COLUMNS = {"step": np.int64, "unique_id": np.int64, "species": np.int8, "x": np.int32, "y": np.int32,
+                 "age": np.int32, "hunger": np.int16, "energy": np.int16, "sleepiness": np.int16,
+                 "health": np.int16, "state": np.int16}
+
+SPECIES = (DogAgent, CatAgent)
+STATES_FILE = "states.json"
+
+
+class ChunkedTable:
+    """Rows collected in preallocated column arrays and appended to a ColumnWriter when full"""
+    def __init__(self, path, columns, chunk_size):
+        self.writer = ColumnWriter(path, columns)
+        self.chunk = {name: np.empty(chunk_size, dtype=dtype) for name, dtype in columns.items()}
+        self.chunk_size = chunk_size
+        self.filled = 0
+
+    def append(self, rows, length):
+        """Add `length` rows given as {column: scalar or array}"""
+        done = 0
+        while done < length:
+            count = min(length - done, self.chunk_size - self.filled)
+            for name, column in self.chunk.items():
+                values = rows[name]
+                column[self.filled:self.filled + count] = values if np.ndim(values) == 0 else values[done:done + count]
+            self.filled += count
+            done += count
+            if self.filled == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if self.filled:
+            self.writer.append({name: column[:self.filled] for name, column in self.chunk.items()})
+            self.writer.flush()
+            self.filled = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class Recorder:
+    """
+    Observer recording model metrics every step and pet rows every
+    agent_every steps (0 disables them). agent_sample caps the pets recorded
+    per step, picked with an RNG of its own so the run itself is unaffected.
+    An existing recording at path is appended to.
+    """
+    def __init__(self, model, path, chunk_size=4096, agent_every=0, agent_sample=None, sample_seed=0):
+        self.model = model
+        self.path = path
+        self.agent_every = agent_every
+        self.agent_sample = agent_sample
+        self.rng = np.random.default_rng(sample_seed)
+        self.metrics = ChunkedTable(os.path.join(path, "model"), MODEL_COLUMNS, chunk_size)
+        self.agents = ChunkedTable(os.path.join(path, "agents"), AGENT_COLUMNS, chunk_size) if agent_every else None
+
+        states_path = os.path.join(path, STATES_FILE)
+        states = []
+        if os.path.exists(states_path):
+            with open(states_path) as f:
+                states = json.load(f)
+        self.states = {name: code for code, name in enumerate(states)}
+        self._states_written = len(self.states)
+        model.observers.append(self)
+
+    def __call__(self, model):
+        row = {name: getattr(model, name) for name in MODEL_METRICS}
+        row["step"] = model.step_count
+        row.update(model.deaths_by_cause)
+        self.metrics.append(row, 1)
+        if self.agents is not None and model.step_count % self.agent_every == 0:
+            self.record_agents(model)
+
+    def record_agents(self, model):
+        pets = [pet for cls in SPECIES for pet in model.live_agents[cls].values()]
+        if self.agent_sample is not None and len(pets) > self.agent_sample:
+            picked = np.sort(self.rng.choice(len(pets), self.agent_sample, replace=False))
+            pets = [pets[i] for i in picked]
+        states = self.states
+        for pet in pets:
+            if pet.state not in states:
+                states[pet.state] = len(states)
+        if len(states) != self._states_written:
+            # Saved before any row using the new codes can reach the disk
+            with open(os.path.join(self.path, STATES_FILE), "w") as f:
+                json.dump(sorted(states, key=states.get), f)
+            self._states_written = len(states)
+        rows = {
+            "step": model.step_count,
+            "unique_id": np.array([pet.unique_id for pet in pets], dtype=np.int64),
+            "species": np.array([SPECIES.index(type(pet)) for pet in pets], dtype=np.int8),
+            "x": np.array([pet.pos[0] for pet in pets], dtype=np.int32),
+            "y": np.array([pet.pos[1] for pet in pets], dtype=np.int32),
+            "age": np.array([pet.age for pet in pets], dtype=np.int32),
+            "hunger": np.array([pet.hunger for pet in pets], dtype=np.int16),
+            "energy": np.array([getattr(pet, "energy", -1) for pet in pets], dtype=np.int16),
+            "sleepiness": np.array([getattr(pet, "sleepiness", -1) for pet in pets], dtype=np.int16),
+            "health": np.array([pet.health for pet in pets], dtype=np.int16),
+            "state": np.array([states[pet.state] for pet in pets], dtype=np.int16),
+        }
+        self.agents.append(rows, len(pets))
+
+    def flush(self):
+        """Write out the partly filled chunks"""
+        self.metrics.flush()
+        if self.agents is not None:
+            self.agents.flush()
+
+    def close(self):
+        self.flush()
+        self.metrics.close()
+        if self.agents is not None:
+            self.agents.close()
+        if self in self.model.observers:
+            self.model.observers.remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path, mmap=True):
+    """Load a Recorder directory as {"model": columns, "agents": columns or None, "states": [names]}"""
+    agents_path = os.path.join(path, "agents")
+    states_path = os.path.join(path, STATES_FILE)
+    states = []
+    if os.path.exists(states_path):
+        with open(states_path) as f:
+            states = json.load(f)
+    return {
+        "model": read_columns(os.path.join(path, "model"), mmap=mmap),
+        "agents": read_columns(agents_path, mmap=mmap) if os.path.exists(agents_path) else None,
+        "states": states,
+    }
@@ -1,3 +1,8 @@
-from server import server
+import sys
+from server import make_server, make_live_server
 
-server.launch()
+# Only the server being launched is built
+if "--live" in sys.argv:
+    make_live_server().launch()
+else:
+    make_server().launch()
@@ -0,0 +1,140 @@
+import heapq
+
+from mesa.time import RandomActivation
+
+
+class CompactRandomActivation(RandomActivation):
+    """
+    RandomActivation keeping its agents in a plain dict instead of an AgentSet.
+
+    The activation order and the draws from model.random are exactly those of
+    RandomActivation. It saves the weak reference mesa keeps per agent and the
+    WeakKeyDictionary that AgentSet.shuffle rebuilds on every step. Agents are
+    held strongly until remove() is called, as PetModel.remove_agent always does.
+    Every BaseScheduler method that reads the agents is overridden to use the
+    dict, so the inherited AgentSet stays empty.
+    """
+    def __init__(self, model):
+        super().__init__(model)
+        self._order = {}
+
+    def add(self, agent):
+        if agent in self._order:
+            raise ValueError("agent already added to scheduler")
+        self._order[agent] = None
+
+    def remove(self, agent):
+        del self._order[agent]
+
+    def get_agent_count(self):
+        return len(self._order)
+
+    @property
+    def agents(self):
+        return list(self._order)
+
+    def get_agent_keys(self, shuffle=False):
+        keys = [agent.unique_id for agent in self._order]
+        if shuffle:
+            self.model.random.shuffle(keys)
+        return keys
+
+    def do_each(self, method, shuffle=False):
+        agents = list(self._order)
+        if shuffle:
+            self.model.random.shuffle(agents)
+            self._order = dict.fromkeys(agents)
+        for agent in agents:
+            getattr(agent, method)()
+
+    def step(self):
+        agents = list(self._order)
+        self.model.random.shuffle(agents)
+        self._order = dict.fromkeys(agents)
+        # Agents added during the step wait for the next one; removed ones see pos None and return
+        for agent in agents:
+            agent.step()
+        self.steps += 1
+        self.time += 1
+
+
+class EventScheduler(CompactRandomActivation):
+    """
+    Activates only the agents that have something to do, plus a priority
+    queue of timed events for the rest.
+
+    at(tick, agent, action) calls agent.<action>() at the start of that tick,
+    before the activations, and suspend(agent, ticks) takes an agent out of
+    the activation order until `ticks` ticks have passed. PetModel uses them so
+    food markers never join the activation order (each one's expiry is a
+    single event) and feeders sleep through their cooldown. Agents still
+    activated keep the random order, though the shuffle now covers fewer agents,
+    so runs differ from RandomActivation ones for the same seed.
+    """
+    def __init__(self, model):
+        super().__init__(model)
+        # (tick, sequence, unique_id, agent, action); action None puts the agent back in the order
+        self._events = []
+        self._sequence = 0
+
+    def at(self, tick, agent, action):
+        heapq.heappush(self._events, (tick, self._sequence, agent.unique_id, agent, action))
+        self._sequence += 1
+
+    def suspend(self, agent, ticks):
+        del self._order[agent]
+        self.at(self.model.step_count + ticks + 1, agent, None)
+
+    def remove(self, agent):
+        # Agents waiting on an event are not in the order; their stale events are skipped
+        self._order.pop(agent, None)
+
+    def pending(self):
+        """Live queued events as (tick, unique_id, action) in firing order"""
+        return [(tick, unique_id, action) for tick, _, unique_id, agent, action in sorted(self._events)
+                if agent.pos is not None and agent.unique_id == unique_id]
+
+    def step(self):
+        self.run_events()
+        super().step()
+
+    def run_events(self):
+        """Fire the events due this tick"""
+        events = self._events
+        tick = self.model.step_count
+        while events and events[0][0] <= tick:
+            _, _, unique_id, agent, action = heapq.heappop(events)
+            # Removed agents, and food markers recycled under a new id, are stale
+            if agent.pos is None or agent.unique_id != unique_id:
+                continue
+            if action is None:
+                self._order[agent] = None
+            else:
+                getattr(agent, action)()
+
+
+class FastForwardScheduler(EventScheduler):
+    """
+    EventScheduler that lets idle pets fast-forward while model.coasting is set.
+
+    A living pet with a coast() method gets it called in place of step(); when
+    coast() declines, the pet steps as usual. Dying is checked first, as step()
+    would, and death_cause() draws nothing from model.random, so the draws match
+    those of pets deciding to coast in their own step(). Exact runs use
+    EventScheduler and pay nothing for the check.
+    """
+    def step(self):
+        if not self.model.coasting:
+            super().step()
+            return
+        self.run_events()
+        agents = list(self._order)
+        self.model.random.shuffle(agents)
+        self._order = dict.fromkeys(agents)
+        for agent in agents:
+            coast = getattr(agent, "coast", None)
+            if coast is not None and agent.pos is not None and agent.death_cause() is None and coast():
+                continue
+            agent.step()
+        self.steps += 1
+        self.time += 1
@@ -1,8 +1,10 @@
-from mesa.visualization.modules import CanvasGrid
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.modules import TextElement
 from model import PetModel
-from agents import DogAgent, CatAgent, FeederAgent, FoodMarker, BusinessAgent
+from events import VERBOSE
+from agents import DogAgent, CatAgent, FeederAgent, BusinessAgent
+from delta_grid import DeltaGrid
+from live import LiveModel, LiveServer, LiveControls
 
 class PopulationText(TextElement):
     """
@@ -18,83 +20,99 @@ class PopulationText(TextElement):
                 f"Births: {model.total_births} | "
                 f"Harvested: {model.total_harvested} | Money: ${model.total_money_made}")
 
-def agent_portrayal(agent):
-    portrayal = {"Shape": "circle", "Filled": "true", "r": 0.5, "Layer": 0, "Color": "grey"}
+def _style(shape, layer, r, color, text="", text_color="black", **extra):
+    return {"Shape": shape, "Filled": "true", "Layer": layer, "r": r, "Color": color,
+            "text": text, "text_color": text_color, **extra}
 
-    # Add state text and age info for pets
-    if hasattr(agent, "state"):
-        if hasattr(agent, "age"):
-            portrayal["text"] = f"{agent.state}\nAge:{agent.age}"
-        else:
-            portrayal["text"] = agent.state
-        portrayal["text_color"] = "black"
 
+# Static portrayal parts, sent to the browser once; {label} is the agent state and
+# {age} is derived from the birth step sent as the value
+PET_TEXT = "{label}\nAge:{age}"
+STYLES = {
+    **{f"dog-{color}": _style("static/img/dog.png", 2, 1, color, PET_TEXT)
+       for color in ("red", "orange", "pink", "brown")},
+    **{f"cat-{color}": _style("static/img/cat.png", 2, 1, color, PET_TEXT)
+       for color in ("red", "orange", "pink", "gray")},
+    "business": _style("static/img/businessman.png", 3, 1.2, "black", "💼\n${value}", "white"),
+    "feeder": _style("static/img/feeder.png", 1, 1, "blue", "{label}"),
+    # Food gets darker as it ages
+    "food": _style("static/img/food.png", 0, 0.5, "rgb(139, 255, 69)", age_color=True),
+}
+
+
+def agent_portrayal(agent):
+    """(style name, label, value) of an agent for DeltaGrid"""
+    born = agent.model.step_count - getattr(agent, "age", 0)
     if isinstance(agent, DogAgent):
-        portrayal["Shape"] = "static/img/dog.png"
-        portrayal["Layer"] = 2
-        portrayal["r"] = 1
         # Color code by hunger level
         if agent.hunger >= 20:
-            portrayal["Color"] = "red"  # Very hungry
+            color = "red"  # Very hungry
         elif agent.hunger >= 15:
-            portrayal["Color"] = "orange"  # Hungry
+            color = "orange"  # Hungry
         elif agent.reproduction_cooldown == 0 and agent.age >= 30:
-            portrayal["Color"] = "pink"  # Ready to mate
+            color = "pink"  # Ready to mate
         else:
-            portrayal["Color"] = "brown"  # Normal
-            
-    elif isinstance(agent, CatAgent):
-        portrayal["Shape"] = "static/img/cat.png"
-        portrayal["Layer"] = 2
-        portrayal["r"] = 1
-        # Color code by hunger level
+            color = "brown"  # Normal
+        return f"dog-{color}", agent.state, born
+
+    if isinstance(agent, CatAgent):
         if agent.hunger >= 18:
-            portrayal["Color"] = "red"  # Very hungry
+            color = "red"
         elif agent.hunger >= 12:
-            portrayal["Color"] = "orange"  # Hungry
+            color = "orange"
         elif agent.reproduction_cooldown == 0 and agent.age >= 25:
-            portrayal["Color"] = "pink"  # Ready to mate
+            color = "pink"
         else:
-            portrayal["Color"] = "gray"  # Normal
-            
-    elif isinstance(agent, BusinessAgent):
-        portrayal["Shape"] = "static/img/businessman.png"  # Changed to use the businessman image
-        portrayal["Layer"] = 3
-        portrayal["r"] = 1.2
-        portrayal["Color"] = "black"
-        portrayal["text"] = f"💼\n${agent.money_earned}"
-        portrayal["text_color"] = "white"
-        
-    elif isinstance(agent, FeederAgent):
-        portrayal["Shape"] = "static/img/feeder.png"
-        portrayal["Layer"] = 1
-        portrayal["r"] = 1
-        portrayal["Color"] = "blue"
-        
-    elif isinstance(agent, FoodMarker):
-        portrayal["Shape"] = "static/img/food.png"
-        portrayal["Layer"] = 0
-        portrayal["r"] = 0.5
-        portrayal["text"] = ""
-        # Food gets darker as it ages
-        freshness = max(0, (100 - agent.age) / 100)
-        green_value = int(255 * freshness)
-        portrayal["Color"] = f"rgb(139, {green_value}, 69)"  # Brown to dark brown
-
-    return portrayal
-
-grid = CanvasGrid(agent_portrayal, 20, 20, 500, 500)
-population_text = PopulationText()
-
-server = ModularServer(
-    PetModel,
-    [grid, population_text],
-    "Virtual Pet Ecosystem - Improved Version",
-    {
-        "width": 20,
-        "height": 20,
-        "num_dogs": 8,  
-        "num_cats": 8,
-        "num_feeders": 3 
-    }
-)
\ No newline at end of file
+            color = "gray"
+        return f"cat-{color}", agent.state, born
+
+    if isinstance(agent, BusinessAgent):
+        return "business", None, agent.money_earned
+
+    if isinstance(agent, FeederAgent):
+        return "feeder", agent.state, 0
+
+    return "food", None, born
+
+
+MODEL_PARAMS = {
+    "width": 20,
+    "height": 20,
+    "num_dogs": 8,
+    "num_cats": 8,
+    "num_feeders": 3
+}
+
+def make_server():
+    """The browser view, stepping the model on each request from the page"""
+    return ModularServer(
+        PetModel,
+        [DeltaGrid(agent_portrayal, STYLES, 20, 20, 500, 500), PopulationText()],
+        "Virtual Pet Ecosystem - Improved Version",
+        # Print every birth, capture and departure to the console, as the simulation always has
+        dict(MODEL_PARAMS, verbosity=VERBOSE)
+    )
+
+
+def make_live_server():
+    """Same view, with the model stepped in the background (python run.py --live)"""
+    return LiveServer(
+        LiveModel,
+        [DeltaGrid(agent_portrayal, STYLES, 20, 20, 500, 500), PopulationText(), LiveControls()],
+        "Virtual Pet Ecosystem - Live",
+        MODEL_PARAMS
+    )
+
+
+# The servers used to be built at import time; `from server import server` still works
+_FACTORIES = {"server": make_server, "live_server": make_live_server}
+
+
+def __getattr__(name):
+    if name in _FACTORIES:
+        # Built on first access and kept, so every import sees the same object
+        value = globals()[name] = _FACTORIES[name]()
+        return value
+    if name in ("grid", "population_text"):
+        return __getattr__("server").visualization_elements[name == "population_text"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,337 @@
+import heapq
+from collections import OrderedDict, defaultdict
+from operator import itemgetter
+from mesa.space import MultiGrid
+
+from chunked_grid import ChunkedGrid
+
+
+class SpatialIndex:
+    """
+    Per-class index of agent positions, bucketed into square blocks of cells.
+
+    Queries only visit the blocks that overlap the search window and only look
+    at agents of the requested class, instead of every cell within the radius.
+    Results follow MultiGrid.get_neighbors(moore=True, include_center=False)
+    exactly: cells in neighbourhood order, agents in a cell in placement order.
+    """
+    def __init__(self, width, height, bucket_size=8):
+        self.width = width
+        self.height = height
+        self.bucket_size = bucket_size
+        self.buckets_x = -(-width // bucket_size)
+        self.buckets_y = -(-height // bucket_size)
+        # agent class -> {(bx, by): {pos: [(seq, agent), ...]}}
+        self._buckets = defaultdict(dict)
+        # Placement sequence, mirrors the append order of the grid's cell lists
+        self._seq = 0
+
+    def add(self, agent, pos):
+        blocks = self._buckets[type(agent)]
+        key = (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+        block = blocks.get(key)
+        if block is None:
+            block = blocks[key] = {}
+        cell = block.get(pos)
+        if cell is None:
+            cell = block[pos] = []
+        cell.append((self._seq, agent))
+        self._seq += 1
+
+    def remove(self, agent, pos):
+        blocks = self._buckets[type(agent)]
+        key = (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+        block = blocks[key]
+        cell = block[pos]
+        for i, (_, other) in enumerate(cell):
+            if other is agent:
+                del cell[i]
+                break
+        if not cell:
+            del block[pos]
+            if not block:
+                del blocks[key]
+
+    def within_radius(self, pos, agent_type, radius):
+        """All agents of agent_type in the torus Moore neighbourhood of pos, in get_neighbors order"""
+        found = list(self._candidates(pos, agent_type, radius))
+        found.sort(key=lambda c: c[1])
+        return [agent for _, _, agent in found]
+
+    def nearest_first(self, pos, agent_type, radius):
+        """
+        The agents within_radius returns, sorted by distance_to from pos; ties
+        keep their get_neighbors order, as a stable sort of within_radius would
+        """
+        found = list(self._candidates(pos, agent_type, radius))
+        found.sort(key=itemgetter(0, 1))
+        return [agent for _, _, agent in found]
+
+    def nearest(self, pos, agent_type, radius, predicate=None):
+        """
+        The agent of agent_type within radius that get_neighbors followed by
+        min(key=distance_to) would pick, optionally filtered by predicate.
+        Distance is the (non-wrapped) Chebyshev distance used by distance_to.
+        """
+        best = None
+        best_key = None
+        for dist, rank, agent in self._candidates(pos, agent_type, radius):
+            key = (dist, rank)
+            if best_key is not None and key >= best_key:
+                continue
+            if predicate is not None and not predicate(agent):
+                continue
+            best = agent
+            best_key = key
+        return best
+
+    def _candidates(self, pos, agent_type, radius):
+        """Yield (distance, neighbourhood rank, agent) for agents in the neighbourhood of pos"""
+        x, y = pos
+        width, height = self.width, self.height
+        bx_range = self._bucket_span(x, radius, width, self.buckets_x)
+        by_range = self._bucket_span(y, radius, height, self.buckets_y)
+        for cls, blocks in self._buckets.items():
+            if not issubclass(cls, agent_type):
+                continue
+            for bx in bx_range:
+                for by in by_range:
+                    block = blocks.get((bx, by))
+                    if block is None:
+                        continue
+                    for cell_pos, cell in block.items():
+                        if cell_pos == pos:
+                            continue
+                        cx, cy = cell_pos
+                        # First offset in [-radius, radius] that wraps onto the cell,
+                        # which is where get_neighborhood lists it
+                        ox = (cx - x + radius) % width - radius
+                        if ox > radius:
+                            continue
+                        oy = (cy - y + radius) % height - radius
+                        if oy > radius:
+                            continue
+                        dist = max(abs(cx - x), abs(cy - y))
+                        for seq, agent in cell:
+                            yield dist, (ox, oy, seq), agent
+
+    def _bucket_span(self, center, radius, size, num_buckets):
+        """Bucket indices along one axis covered by the wrapped window center +/- radius"""
+        if 2 * radius + 1 >= size:
+            return range(num_buckets)
+        span = []
+        v = center - radius
+        end = center + radius
+        while v <= end:
+            w = v % size
+            b = w // self.bucket_size
+            if b not in span:
+                span.append(b)
+            v += min((b + 1) * self.bucket_size, size) - w
+        return span
+
+
+def moore_neighborhood(pos, width, height, include_center):
+    """MultiGrid.get_neighborhood(pos, moore=True, include_center) on a width x height torus"""
+    x, y = pos
+    cells = dict.fromkeys(((x + dx) % width, (y + dy) % height) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+    if not include_center:
+        cells.pop(pos, None)
+    return tuple(cells)
+
+
+class NeighborhoodTable:
+    """
+    Radius-1 Moore neighbourhoods of a torus grid, as get_neighborhood(pos,
+    moore=True) returns them, kept in one slot per cell id (x * height + y)
+    and filled on first use. around(pos) leaves pos out; block(pos) has it.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._around = [None] * (width * height)
+        self._block = [None] * (width * height)
+
+    def around(self, pos):
+        cell = pos[0] * self.height + pos[1]
+        cells = self._around[cell]
+        if cells is None:
+            cells = self._around[cell] = moore_neighborhood(pos, self.width, self.height, False)
+        return cells
+
+    def block(self, pos):
+        cell = pos[0] * self.height + pos[1]
+        cells = self._block[cell]
+        if cells is None:
+            cells = self._block[cell] = moore_neighborhood(pos, self.width, self.height, True)
+        return cells
+
+
+class LRUNeighborhoodTable:
+    """
+    NeighborhoodTable for maps too large for a slot per cell: only the
+    max_entries most recently used neighbourhoods of each kind are kept.
+    """
+    def __init__(self, width, height, max_entries=1 << 16):
+        self.width = width
+        self.height = height
+        self.max_entries = max_entries
+        self._around = OrderedDict()
+        self._block = OrderedDict()
+
+    def around(self, pos):
+        return self._lookup(self._around, pos, False)
+
+    def block(self, pos):
+        return self._lookup(self._block, pos, True)
+
+    def _lookup(self, table, pos, include_center):
+        cells = table.get(pos)
+        if cells is None:
+            cells = table[pos] = moore_neighborhood(pos, self.width, self.height, include_center)
+            if len(table) > self.max_entries:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(pos)
+        return cells
+
+
+class OccupancyIndex:
+    """
+    Agent count per cell, with cells bucketed by count (a bucket queue).
+
+    Each bucket is a min-heap of cell ids (x * height + y, the x-major scan
+    order) with lazy deletion, so the first least crowded cell of a full grid
+    scan is found without scanning. Bucket 0 holds the empty cells.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.counts = [0] * (width * height)
+        # Number of cells per occupancy, and the heap of candidate cell ids for it
+        self.sizes = {0: width * height}
+        self._heaps = {0: list(range(width * height))}
+        # Lower bound on the smallest occupancy in use
+        self._min = 0
+
+    @property
+    def empty_count(self):
+        return self.sizes.get(0, 0)
+
+    def add(self, pos):
+        self._shift(pos, 1)
+
+    def remove(self, pos):
+        self._shift(pos, -1)
+
+    def least_crowded(self):
+        """First cell in x-major order among those holding the fewest agents"""
+        occupancy = self._min
+        while True:
+            heap = self._heaps.get(occupancy)
+            if heap:
+                while heap and self.counts[heap[0]] != occupancy:
+                    heapq.heappop(heap)
+                if heap:
+                    self._min = occupancy
+                    return divmod(heap[0], self.height)
+            occupancy += 1
+
+    def _shift(self, pos, delta):
+        cell = pos[0] * self.height + pos[1]
+        old = self.counts[cell]
+        new = old + delta
+        self.counts[cell] = new
+        self.sizes[old] -= 1
+        self.sizes[new] = self.sizes.get(new, 0) + 1
+
+        heap = self._heaps.get(new)
+        if heap is None:
+            heap = self._heaps[new] = []
+        heapq.heappush(heap, cell)
+        if new < self._min:
+            self._min = new
+
+        # Drop stale entries once they outnumber the live ones; a sorted list is a valid heap
+        old_heap = self._heaps[old]
+        if len(old_heap) > 2 * self.sizes[old] + 64:
+            self._heaps[old] = sorted({c for c in old_heap if self.counts[c] == old})
+
+
+class SparseOccupancyIndex:
+    """
+    OccupancyIndex for very large grids: only occupied cells are counted, and
+    while any cell is empty the least crowded cell is the first free cell id,
+    found by walking forward from a hint instead of keeping heaps of all cells.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # cell id -> agent count, for occupied cells only
+        self.counts = {}
+        # No free cell id is smaller than this
+        self._free_hint = 0
+
+    @property
+    def empty_count(self):
+        return self.width * self.height - len(self.counts)
+
+    def add(self, pos):
+        cell = pos[0] * self.height + pos[1]
+        self.counts[cell] = self.counts.get(cell, 0) + 1
+
+    def remove(self, pos):
+        cell = pos[0] * self.height + pos[1]
+        count = self.counts[cell] - 1
+        if count:
+            self.counts[cell] = count
+        else:
+            del self.counts[cell]
+            if cell < self._free_hint:
+                self._free_hint = cell
+
+    def least_crowded(self):
+        """First cell in x-major order among those holding the fewest agents"""
+        if self.empty_count:
+            cell = self._free_hint
+            while cell in self.counts:
+                cell += 1
+            self._free_hint = cell
+        else:
+            cell = min(self.counts, key=lambda c: (self.counts[c], c))
+        return divmod(cell, self.height)
+
+
+class IndexedGridMixin:
+    """
+    Keeps a SpatialIndex and an occupancy index up to date on place/move/remove,
+    and serves radius-1 Moore neighbourhoods from a neighbourhood table
+    """
+    def _init_indexes(self, bucket_size, occupancy_cls, table_cls):
+        self.index = SpatialIndex(self.width, self.height, bucket_size)
+        self.occupancy = occupancy_cls(self.width, self.height)
+        self.neighborhoods = table_cls(self.width, self.height)
+
+    def place_agent(self, agent, pos):
+        super().place_agent(agent, pos)
+        self.index.add(agent, agent.pos)
+        self.occupancy.add(agent.pos)
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        super().remove_agent(agent)
+        self.index.remove(agent, pos)
+        self.occupancy.remove(pos)
+
+
+class IndexedMultiGrid(IndexedGridMixin, MultiGrid):
+    def __init__(self, width, height, torus, bucket_size=8):
+        super().__init__(width, height, torus)
+        self._init_indexes(bucket_size, OccupancyIndex, NeighborhoodTable)
+
+
+class IndexedChunkedGrid(IndexedGridMixin, ChunkedGrid):
+    """ChunkedGrid with the same indexes, for maps too large for a dense MultiGrid"""
+    def __init__(self, width, height, torus, chunk_size=64, bucket_size=8):
+        super().__init__(width, height, torus, chunk_size)
+        self._init_indexes(bucket_size, SparseOccupancyIndex, LRUNeighborhoodTable)
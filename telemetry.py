@@ -0,0 +1,202 @@
+"""
+Live metric frames of a running PetModel for any number of viewers.
+
+A TelemetryHub is a model observer: after each step it encodes one compact
+JSON frame of the model's counters, once, and hands it to the asyncio loop
+serving the viewers. The loop fans it out over Server-Sent Events
+(/telemetry/events) or WebSocket (/telemetry/ws). The simulation never waits
+for a viewer: each one has a small queue of frames, and a viewer that falls
+behind loses its oldest frames rather than holding the others or the model
+back. Since the counters are cumulative, the newest frame is always complete.
+
+    python telemetry.py --port 8522 --steps-per-second 20
+    curl -N http://127.0.0.1:8522/telemetry/events
+
+`python run.py --live` serves the same endpoints next to the page.
+"""
+import argparse
+import asyncio
+import collections
+import json
+
+import tornado.ioloop
+import tornado.iostream
+import tornado.web
+import tornado.websocket
+
+FRAME_FIELDS = ("step_count", "dog_count", "cat_count", "food_count", "business_agents_active", "total_births",
+                "total_deaths", "total_harvested", "total_money_made")
+
+
+class Subscriber:
+    """Bounded frame queue of one viewer; when full, the oldest frame makes room"""
+    def __init__(self, queue_size):
+        self.queue = collections.deque(maxlen=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def offer(self, frame):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(frame)
+        self._ready.set()
+
+    def drain(self):
+        """Take every queued frame without waiting"""
+        frames = list(self.queue)
+        self.queue.clear()
+        return frames
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.closed:
+            if self.queue:
+                return self.queue.popleft()
+            self._ready.clear()
+            await self._ready.wait()
+        raise StopAsyncIteration
+
+
+class TelemetryHub:
+    """
+    Model observer broadcasting a frame every `every` steps. Frames are only
+    built while someone is subscribed, and are (json text, SSE event bytes).
+    The model may be stepped on any thread; subscribers live on the loop
+    of the first subscribe() call.
+    """
+    def __init__(self, every=1, queue_size=32):
+        self.every = every
+        self.queue_size = queue_size
+        self.model = None
+        self.subscribers = set()
+        self.frames = 0
+        self._loop = None
+
+    def attach(self, model):
+        """Observe `model` instead of the current one"""
+        self.detach()
+        self.model = model
+        model.observers.append(self)
+
+    def detach(self):
+        if self.model is not None and self in self.model.observers:
+            self.model.observers.remove(self)
+        self.model = None
+
+    def subscribe(self):
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+        subscriber.close()
+
+    def __call__(self, model):
+        if not self.subscribers or (model.step_count % self.every and model.running):
+            return
+        text = json.dumps({name: getattr(model, name) for name in FRAME_FIELDS}, separators=(",", ":"))
+        event = f"id: {model.step_count}\ndata: {text}\n\n".encode()
+        try:
+            self._loop.call_soon_threadsafe(self._publish, (text, event))
+        except RuntimeError:
+            # The serving loop has been closed
+            self.subscribers.clear()
+
+    def _publish(self, frame):
+        self.frames += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(frame)
+
+
+class TelemetryEventsHandler(tornado.web.RequestHandler):
+    """GET /telemetry/events: one SSE event per frame"""
+    def initialize(self, hub):
+        self.hub = hub
+        self.subscriber = None
+
+    async def get(self):
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.subscriber = self.hub.subscribe()
+        try:
+            async for _, event in self.subscriber:
+                self.write(event)
+                for _, event in self.subscriber.drain():
+                    self.write(event)
+                # Waits while the client's socket is full; its queue absorbs the frames meanwhile
+                await self.flush()
+        except tornado.iostream.StreamClosedError:
+            pass
+        finally:
+            self.hub.unsubscribe(self.subscriber)
+
+    def on_connection_close(self):
+        if self.subscriber is not None:
+            self.hub.unsubscribe(self.subscriber)
+
+
+class TelemetrySocketHandler(tornado.websocket.WebSocketHandler):
+    """WebSocket /telemetry/ws: one text message per frame"""
+    def initialize(self, hub):
+        self.hub = hub
+        self.subscriber = None
+
+    def open(self):
+        self.subscriber = self.hub.subscribe()
+        tornado.ioloop.IOLoop.current().spawn_callback(self._send)
+
+    async def _send(self):
+        async for text, _ in self.subscriber:
+            try:
+                await self.write_message(text)
+            except tornado.websocket.WebSocketClosedError:
+                break
+        self.hub.unsubscribe(self.subscriber)
+
+    def on_close(self):
+        self.hub.unsubscribe(self.subscriber)
+
+
+def telemetry_handlers(hub):
+    """Routes serving `hub`, to add to a tornado Application"""
+    return [(r"/telemetry/events", TelemetryEventsHandler, {"hub": hub}),
+            (r"/telemetry/ws", TelemetrySocketHandler, {"hub": hub})]
+
+
+def main(argv=None):
+    from batch import SWEEP_PARAMS
+    from live import LiveModel
+
+    parser = argparse.ArgumentParser(description="Run PetModel in the background and stream its metrics")
+    parser.add_argument("--port", type=int, default=8522)
+    parser.add_argument("--steps-per-second", type=float, default=None, help="defaults to full speed")
+    parser.add_argument("--every", type=int, default=1, help="send a frame every this many steps")
+    parser.add_argument("--seed", type=int, default=None)
+    for name, default in SWEEP_PARAMS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=default)
+    args = parser.parse_args(argv)
+
+    live = LiveModel(steps_per_second=args.steps_per_second, seed=args.seed,
+                     **{name: getattr(args, name) for name in SWEEP_PARAMS})
+    hub = TelemetryHub(every=args.every)
+    hub.attach(live.model)
+    tornado.web.Application(telemetry_handlers(hub)).listen(args.port)
+    print(f"Streaming metrics at http://127.0.0.1:{args.port}/telemetry/events")
+    live.step()
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    except KeyboardInterrupt:
+        live.stop()
+
+
+if __name__ == "__main__":
+    main()